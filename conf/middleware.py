@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+from conf.routers import replica_reads
+
+try:
+    import brotli
+except ImportError:  # optional, GZipMiddleware still compresses without it
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class BrotliMiddleware(MiddlewareMixin):
+    """
+    Brotli-compress responses for clients that accept it. Sits right after
+    GZipMiddleware, which then leaves already encoded responses alone.
+    """
+    min_length = 200
+    # dynamic responses, favour speed over ratio
+    quality = 5
+
+    def process_response(self, request, response):
+        if brotli is None or response.streaming or response.has_header("Content-Encoding"):
+            return response
+        if len(response.content) < self.min_length:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not re_accepts_brotli.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return response
+
+        compressed = brotli.compress(response.content, quality=self.quality)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        # the body is no longer byte-identical to what the strong ETag described
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+class ReplicaReadsMiddleware(MiddlewareMixin):
+    """
+    Let views marked `replica_reads = True` read from the replicas on safe requests.
+    A successful write sets a short-lived cookie that keeps the client on the primary,
+    so it reads its own changes back while the replicas catch up.
+    """
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, "view_class", view_func)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in self.safe_methods
+            and getattr(view, "replica_reads", False)
+            and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+        ):
+            request._replica_reads_token = replica_reads.set(True)
+
+    def process_response(self, request, response):
+        token = getattr(request, "_replica_reads_token", None)
+        if token is not None:
+            replica_reads.reset(token)
+        elif settings.DATABASE_REPLICAS and request.method not in self.safe_methods and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, "1", max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
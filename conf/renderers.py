@@ -0,0 +1,73 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # stdlib json through DRF's encoder then
+    orjson = None
+
+if orjson is not None:
+    # UUID and datetime are encoded natively; "Z" for UTC like DRF's encoder
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def orjson_default(obj):
+    """Types orjson doesn't encode natively, along the lines of DRF's JSONEncoder."""
+    if isinstance(obj, Decimal):
+        # same string DecimalField gives with COERCE_DECIMAL_TO_STRING
+        return str(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer backed by orjson, falls back to the stdlib renderer if it's missing."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=orjson_default, option=options)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    One JSON document per line, for exports. Paginated payloads are unwrapped to their
+    `results`; `dumps_line` is what streaming responses use row by row.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    @staticmethod
+    def dumps_line(row):
+        if orjson is not None:
+            return orjson.dumps(row, default=orjson_default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return (json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n').encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = data.get('results', [data])
+        return b''.join(self.dumps_line(row) for row in data)
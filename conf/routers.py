@@ -0,0 +1,44 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# set by conf.middleware.ReplicaReadsMiddleware for safe requests to views marked `replica_reads = True`
+replica_reads = ContextVar("replica_reads", default=False)
+
+# users, sessions and permissions are read on the primary, so a login or a password
+# change is never checked against a lagging copy
+PRIMARY_ONLY_APPS = {"admin", "auth", "contenttypes", "sessions", "users"}
+
+
+@contextmanager
+def use_replicas():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to a random replica from settings.DATABASE_REPLICAS while replica reads
+    are enabled for the current request, everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not replica_reads.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,197 @@
+"""
+Elasticsearch plumbing shared by the document modules.
+
+Index profiles: a profile bundles the index settings (applied to every document index
+through ELASTICSEARCH_DSL_INDEX_SETTINGS) with the mapping knobs below, which documents
+pick up through the field helpers in this module. Profiles live in settings.py. Mappings
+are built once at import, so they always follow ELASTICSEARCH_INDEX_PROFILE.
+
+Partial updates: PartialUpdateSignalProcessor replaces the stock real-time processor and
+only sends the indexed fields a save changed. Bulk endpoints wrap their writes in
+defer_signal_updates() and reindex the affected documents in one batch themselves.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django_elasticsearch_dsl import fields
+from django_elasticsearch_dsl.apps import DEDConfig
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
+from elasticsearch_dsl import MetaField
+
+# settings ES only accepts at index creation, everything else can be changed on a live index
+STATIC_INDEX_SETTINGS = ('number_of_shards', 'codec')
+
+
+def get_profile(name=None):
+    name = name or settings.ELASTICSEARCH_INDEX_PROFILE
+    try:
+        return settings.ELASTICSEARCH_INDEX_PROFILES[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown Elasticsearch index profile '{name}'.")
+
+
+def index_settings(name=None):
+    return dict(get_profile(name).get('settings', {}))
+
+
+def mapping_options(name=None):
+    """The mapping knobs of profile `name`, with the defaults the field helpers assume."""
+    profile = get_profile(name)
+    return {'norms': profile.get('norms', True), 'index_options': profile.get('index_options', 'freqs')}
+
+
+def dynamic_index_settings(name=None, reset=()):
+    """
+    Settings of profile `name` that can be put on an existing index. Keys listed in
+    `reset` but missing from the profile are sent as None so ES restores its default.
+    """
+    data = {key: None for key in reset}
+    data.update(index_settings(name))
+    return {key: value for key, value in data.items() if key not in STATIC_INDEX_SETTINGS}
+
+
+def mapping_covers(expected, live):
+    """Whether every setting of a document's mapping (`expected`) is present in the live one."""
+    if isinstance(expected, dict):
+        return isinstance(live, dict) and all(mapping_covers(value, live.get(key)) for key, value in expected.items())
+    if isinstance(expected, list):
+        return isinstance(live, list) and sorted(expected) == sorted(live)
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        # ES hands numbers back as floats, e.g. scaling_factor 100.0
+        return isinstance(live, (int, float)) and float(expected) == float(live)
+    return expected == live
+
+
+def live_mapping(index):
+    return next(iter(index.get_mapping().values()))['mappings']
+
+
+def id_field():
+    # _id already holds the pk, this copy only exists as doc values for sorting
+    return fields.KeywordField(index=False)
+
+
+def source_meta():
+    # keep the id copy out of _source so it isn't stored twice
+    return MetaField(excludes=['id'])
+
+
+def body_text_field(**kwargs):
+    """Long free text (descriptions), scoring on it works fine without length norms."""
+    if not mapping_options()['norms']:
+        kwargs.setdefault('norms', False)
+    return fields.TextField(**kwargs)
+
+
+def match_only_text_field(**kwargs):
+    """Text only ever hit by term/match queries (ngram subfields), no phrases so no positions."""
+    options = mapping_options()
+    kwargs.setdefault('index_options', options['index_options'])
+    if not options['norms']:
+        kwargs.setdefault('norms', False)
+    return fields.TextField(**kwargs)
+
+
+# sent with every partial update: `id` is left out of _source (see source_meta) so an
+# update would otherwise drop its doc values, updated_at is what es_reconcile compares
+ALWAYS_SENT_FIELDS = ('id', 'updated_at')
+
+
+def indexed_changes(doc, changed):
+    """
+    Document fields to resend after a save that changed the model attnames in `changed`,
+    empty when no indexed field changed. A save that only moved updated_at (auto_now)
+    still sends it, or es_reconcile would see the document as stale from then on.
+    """
+    if not set(changed) & doc._fields.keys():
+        return []
+    return [name for name in doc._fields if name in changed or name in ALWAYS_SENT_FIELDS]
+
+
+def partial_update(doc, items, **kwargs):
+    """
+    Send (instance, field names) pairs as one bulk of partial `update` actions. Documents
+    ES doesn't have yet are indexed in full instead.
+    """
+    document = doc()
+    preparers = {name: prepare for name, _, prepare in document._prepared_fields}
+    items = [(instance, names) for instance, names in items if names]
+    if not items:
+        return
+    # documents not routed by their id (ProductDocument) tell where each one lives
+    routings = document.routings([instance for instance, _ in items]) if hasattr(document, 'routings') else {}
+    actions = [
+        {
+            '_op_type': 'update',
+            '_index': doc._index._name,
+            '_id': document.generate_id(instance),
+            'doc': {name: preparers[name](instance) for name in names},
+            **({'routing': routings[instance.pk]} if instance.pk in routings else {}),
+        }
+        for instance, names in items
+    ]
+    if doc.django.auto_refresh:
+        kwargs.setdefault('refresh', doc.django.auto_refresh)
+
+    _, errors = document.bulk(actions, raise_on_error=False, **kwargs)
+    missing = {str(error['update']['_id']) for error in errors if error.get('update', {}).get('status') == 404}
+    if missing:
+        document.update(
+            [instance for instance, _ in items if str(document.generate_id(instance)) in missing], **kwargs
+        )
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def defer_signal_updates():
+    """
+    Skip the per-row index updates signals would send inside the block (this thread only).
+    The caller reindexes what it touched in one batch.
+    """
+    _deferred.depth = getattr(_deferred, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _deferred.depth -= 1
+
+
+def signal_updates_deferred():
+    return getattr(_deferred, 'depth', 0) > 0
+
+
+class PartialUpdateSignalProcessor(RealTimeSignalProcessor):
+    """
+    Real-time sync that only sends what a save changed, for models tracking their loaded
+    values (TrackedFieldsMixin). New instances and untracked models are indexed in full.
+    Nothing is sent inside defer_signal_updates().
+    """
+
+    def handle_m2m_changed(self, sender, instance, action, **kwargs):
+        if not signal_updates_deferred():
+            super().handle_m2m_changed(sender, instance, action, **kwargs)
+
+    def handle_pre_delete(self, sender, instance, **kwargs):
+        if not signal_updates_deferred():
+            super().handle_pre_delete(sender, instance, **kwargs)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if not signal_updates_deferred():
+            super().handle_delete(sender, instance, **kwargs)
+
+    def handle_save(self, sender, instance, created=False, **kwargs):
+        if signal_updates_deferred():
+            return
+        changed = None if created or not hasattr(instance, 'changed_fields') else instance.changed_fields()
+        if changed is None:
+            return super().handle_save(sender, instance, **kwargs)
+
+        if DEDConfig.autosync_enabled():
+            for doc in registry.get_documents([instance.__class__]):
+                if not doc.django.ignore_signals:
+                    partial_update(doc, [(instance, indexed_changes(doc, changed))])
+        registry.update_related(instance)
@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 import os
 
@@ -19,14 +19,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
 
-    # custom
-    'users',
-    'products',
-
     # 3rd party
     'rest_framework',
     'rest_framework_simplejwt',
+    # before the project apps, so its index updates run ahead of their model signal receivers
     'django_elasticsearch_dsl',
+
+    # custom
+    'users',
+    'products',
 ]
 
 ELASTICSEARCH_DSL = {
@@ -35,7 +36,46 @@ ELASTICSEARCH_DSL = {
     }
 }
 
+# Index profiles, see conf/search.py. "serving" is the default, "bulk_load" is applied by
+# es_boot_strap while filling an index, "small_footprint" trades refresh latency and
+# scoring detail for disk and heap.
+ELASTICSEARCH_INDEX_PROFILES = {
+    'bulk_load': {
+        'settings': {
+            'number_of_replicas': 0,
+            'refresh_interval': '-1',
+            'translog.durability': 'async',
+        },
+    },
+    'serving': {
+        'settings': {
+            'number_of_replicas': 0,
+            'refresh_interval': '1s',
+        },
+        'norms': True,
+        'index_options': 'freqs',
+    },
+    'small_footprint': {
+        'settings': {
+            'number_of_replicas': 0,
+            'refresh_interval': '30s',
+            'codec': 'best_compression',
+        },
+        'norms': False,
+        'index_options': 'docs',
+    },
+}
+ELASTICSEARCH_INDEX_PROFILE = config('ES_INDEX_PROFILE', default='serving')
+ELASTICSEARCH_DSL_INDEX_SETTINGS = ELASTICSEARCH_INDEX_PROFILES[ELASTICSEARCH_INDEX_PROFILE]['settings']
+
+# products index layout, both need `es_boot_strap --rebuild` to change. With routing on, a product
+# lives on the shard of its primary (earliest linked) category, so category-scoped searches hit one shard.
+ELASTICSEARCH_PRODUCT_SHARDS = config('ES_PRODUCT_SHARDS', default=1, cast=int)
+ELASTICSEARCH_PRODUCT_ROUTING = config('ES_PRODUCT_ROUTING', default=False, cast=bool)
+
 ELASTICSEARCH_DSL_AUTOSYNC = True
+# partial updates for fields a save actually changed, see conf/search.py
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = 'conf.search.PartialUpdateSignalProcessor'
 ELASTICSEARCH_DSL_AUTO_REFRESH = True
 
 # minimal drf setting
@@ -43,8 +83,31 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
+    # orjson-backed, both fall back to the stdlib when orjson isn't installed
+    "DEFAULT_RENDERER_CLASSES": [
+        "conf.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "conf.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# catalog GETs revalidate with ETags (products/caching.py), a reverse proxy may keep them for s-maxage
+CATALOG_CACHE_MAX_AGE = config('CATALOG_CACHE_MAX_AGE', default=0, cast=int)
+CATALOG_CACHE_S_MAXAGE = config('CATALOG_CACHE_S_MAXAGE', default=30, cast=int)
+
+# in-process cache of product rows for the batch endpoint, per worker
+PRODUCT_CACHE_SIZE = config('PRODUCT_CACHE_SIZE', default=10000, cast=int)
+PRODUCT_CACHE_TTL = config('PRODUCT_CACHE_TTL', default=30, cast=int)
+
+# sampled search-query counts (products/analytics.py), replayed by warm_search_cache after a deploy
+SEARCH_ANALYTICS_SAMPLE_RATE = config('SEARCH_ANALYTICS_SAMPLE_RATE', default=0.1, cast=float)
+SEARCH_ANALYTICS_FLUSH_SIZE = config('SEARCH_ANALYTICS_FLUSH_SIZE', default=100, cast=int)
+SEARCH_ANALYTICS_FLUSH_INTERVAL = config('SEARCH_ANALYTICS_FLUSH_INTERVAL', default=30, cast=int)
+
 # i am leaving this cofiguration as default to avoid overkill and enable easy change if needed later
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=10),
@@ -59,12 +122,15 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'conf.middleware.BrotliMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'conf.middleware.ReplicaReadsMiddleware',
 ]
 
 ROOT_URLCONF = 'conf.urls'
@@ -102,6 +168,23 @@ DATABASES = {
     }
 }
 
+# Optional read replicas with the primary's name and credentials, e.g. DB_REPLICA_HOSTS=replica1,replica2:5433.
+# Views marked `replica_reads = True` read from them on GET/HEAD, see conf.routers.ReplicaRouter.
+for number, replica in enumerate(config("DB_REPLICA_HOSTS", default="", cast=Csv()), start=1):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": int(port) if port else DATABASES["default"]["PORT"],
+        # tests run against the primary only
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["conf.routers.ReplicaRouter"]
+# after a client's own write, its reads stay on the primary this long to cover replication lag
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
+REPLICA_STICKY_COOKIE = "primary_reads"
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
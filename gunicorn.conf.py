@@ -0,0 +1,85 @@
+"""
+Gunicorn settings, driven by environment variables (see .env.example).
+
+    gunicorn -c gunicorn.conf.py conf.wsgi:application
+"""
+import multiprocessing
+import os
+import time
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    return value.lower() in ("1", "true", "yes", "on") if value else default
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# views mostly wait on Elasticsearch and Postgres, so a few threads per process buy
+# concurrency for much less memory than extra processes
+workers = env_int("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 9))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = env_int("GUNICORN_THREADS", 4)
+
+# import Django, DRF and elasticsearch-dsl once in the master, workers share those pages copy-on-write
+preload_app = env_bool("GUNICORN_PRELOAD", True)
+
+# recycle workers to cap slow leaks, jittered so they don't all restart at once
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+
+# heartbeat file on tmpfs, a slow container filesystem can otherwise stall workers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+_started = time.monotonic()
+
+
+def when_ready(server):
+    # runs in the master before workers fork, so whatever is built here is shared
+    if preload_app:
+        from django.db import connections
+        from django.urls import get_resolver
+
+        from products.readers import category_list_reader, product_list_reader
+
+        get_resolver().url_patterns
+        product_list_reader.mapper
+        category_list_reader.mapper
+        # nothing opened in the master may be inherited by the workers
+        connections.close_all()
+    server.log.info("Master ready in %.2fs (%s x %s %s)", time.monotonic() - _started, workers, threads, worker_class)
+
+
+def post_fork(server, worker):
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    # open the worker's own Elasticsearch connection pool before the first request
+    from elasticsearch_dsl.connections import connections
+
+    try:
+        if not connections.get_connection().ping():
+            worker.log.warning("Elasticsearch did not answer the warm-up ping")
+    except Exception as exc:
+        worker.log.warning("Elasticsearch warm-up failed: %s", exc)
+    worker.log.info("Worker %s ready %.2fs after master start", worker.pid, time.monotonic() - _started)
+
+
+def worker_exit(server, worker):
+    # max_requests recycling would otherwise drop the worker's buffered search counts
+    from products.analytics import search_recorder
+
+    search_recorder.flush()
@@ -1,3 +1,55 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .models import Category, Product, ProductCategory
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Unfiltered changelists on Postgres take the row count from the planner statistics
+    (pg_class.reltuples) instead of a COUNT(*) over the whole table. Filtered lists and
+    small or never-analyzed tables are counted exactly.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                               [self.object_list.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.exact_below:
+                return row[0]
+        return super().count
+
+
+class CatalogAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # the "N total" link would run the COUNT(*) the paginator avoids
+    show_full_result_count = False
+
+
+@admin.register(Product)
+class ProductAdmin(CatalogAdmin):
+    list_display = ('title', 'price', 'updated_at')
+    search_fields = ('title',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(Category)
+class CategoryAdmin(CatalogAdmin):
+    list_display = ('title', 'updated_at')
+    search_fields = ('title',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(ProductCategory)
+class ProductCategoryAdmin(CatalogAdmin):
+    list_display = ('product', 'category', 'created_at')
+    list_select_related = ('product', 'category')
+    raw_id_fields = ('product', 'category')
@@ -0,0 +1,99 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SearchQueryDaily
+
+logger = logging.getLogger(__name__)
+
+re_whitespace = re.compile(r"\s+")
+# sent by warm_search_cache, replayed queries must not count themselves up
+WARMUP_HEADER = "HTTP_X_SEARCH_WARMUP"
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search query, as stored in SearchQueryDaily."""
+    return re_whitespace.sub(" ", query).strip().lower()[:255]
+
+
+class SearchQueryRecorder:
+    """
+    Samples search queries into an in-process counter and writes it to SearchQueryDaily
+    in one additive upsert once `flush_size` queries are buffered or `flush_interval`
+    seconds have passed. Flushing happens when a request finishes (see signals), so it
+    never delays a response, and once more when a Gunicorn worker exits. Each worker
+    process has its own buffer.
+    """
+
+    def __init__(self, sample_rate, flush_size, flush_interval):
+        self.sample_rate = sample_rate
+        # every sampled query stands for this many
+        self.weight = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer = Counter()
+        self._buffered = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, request, index, query):
+        if not self.weight or not query or WARMUP_HEADER in request.META or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            self._buffer[(timezone.localdate(), index, normalize_query(query))] += self.weight
+            self._buffered += 1
+
+    def due(self):
+        return self._buffered >= self.flush_size or (
+            self._buffered and time.monotonic() - self._flushed_at >= self.flush_interval
+        )
+
+    def flush(self):
+        with self._lock:
+            counts, self._buffer = self._buffer, Counter()
+            self._buffered = 0
+            self._flushed_at = time.monotonic()
+        if not counts:
+            return
+        try:
+            self.write(counts)
+        except DatabaseError:
+            # analytics are best effort, a lost batch only skews the counts a little
+            logger.exception("Dropped %d search query counts", len(counts))
+
+    @staticmethod
+    def write(counts):
+        connection = connections[router.db_for_write(SearchQueryDaily)]
+        if connection.vendor != "postgresql":
+            for (day, index, query), count in counts.items():
+                updated = SearchQueryDaily.objects.filter(day=day, index=index, query=query).update(
+                    count=F("count") + count
+                )
+                if not updated:
+                    SearchQueryDaily.objects.create(day=day, index=index, query=query, count=count)
+            return
+
+        table = connection.ops.quote_name(SearchQueryDaily._meta.db_table)
+        rows = ", ".join(["(%s, %s, %s, %s)"] * len(counts))
+        params = [value for key, count in counts.items() for value in (*key, count)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ("day", "index", "query", "count") VALUES {rows} '
+                f'ON CONFLICT ("day", "index", "query") DO UPDATE SET "count" = {table}."count" + EXCLUDED."count"',
+                params,
+            )
+
+
+search_recorder = SearchQueryRecorder(
+    settings.SEARCH_ANALYTICS_SAMPLE_RATE,
+    settings.SEARCH_ANALYTICS_FLUSH_SIZE,
+    settings.SEARCH_ANALYTICS_FLUSH_INTERVAL,
+)
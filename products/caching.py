@@ -0,0 +1,59 @@
+import hashlib
+from functools import partial, wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion
+
+
+def catalog_cache(name):
+    """
+    Conditional GET for a catalog read (APIView method), keyed on CatalogVersion `name`.
+
+    The ETag is the section generation plus a hash of the URL and Accept header, so an
+    unchanged catalog answers 304 before the view runs. Cache-Control and Surrogate-Key
+    let a reverse proxy keep the page and purge it by section. Only successful, non-streaming
+    responses (and the 304s answering them) get these headers.
+    """
+    def get_version(request):
+        if not hasattr(request, '_catalog_version'):
+            request._catalog_version = CatalogVersion.current(name)
+        return request._catalog_version
+
+    def etag(request, *args, **kwargs):
+        version = get_version(request)
+        if version is None:
+            return None
+        variant = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+        return f"{name}-{version[0]}-{hashlib.md5(variant.encode()).hexdigest()[:12]}"
+
+    def last_modified(request, *args, **kwargs):
+        version = get_version(request)
+        return version[1] if version else None
+
+    def decorator(view_method):
+        conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            response = conditional(partial(view_method, self))(request, *args, **kwargs)
+            if response.status_code not in (200, 304) or response.streaming:
+                # errors and exports aren't catalog pages, nothing may keep or revalidate them
+                del response['ETag']
+                del response['Last-Modified']
+                return response
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.CATALOG_CACHE_MAX_AGE,
+                s_maxage=settings.CATALOG_CACHE_S_MAXAGE,
+            )
+            patch_vary_headers(response, ('Accept',))
+            response['Surrogate-Key'] = name
+            return response
+
+        return wrapper
+
+    return decorator
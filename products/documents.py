@@ -1,43 +1,242 @@
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
 from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
-from .models import Product, Category
+from elasticsearch_dsl import MetaField, Q
+from conf.search import body_text_field, id_field, source_meta
+from .models import Product, Category, ProductCategory
+
+# replicas, refresh interval and codec come from the active index profile (ELASTICSEARCH_DSL_INDEX_SETTINGS)
 
 @registry.register_document
 class ProductDocument(Document):
-    id = fields.KeywordField()
+    id = id_field()
     title = fields.TextField(analyzer='standard')
-    description = fields.TextField(analyzer='standard')
+    description = body_text_field(analyzer='standard')
+    price = fields.ScaledFloatField(scaling_factor=100)
+    # only kept in _source so batch reads can build full rows from ES
+    image = fields.KeywordField(index=False, doc_values=False)
+    category_ids = fields.KeywordField(multi=True)
+    primary_category_id = fields.KeywordField()
+    updated_at = fields.DateField()
 
     class Index:
         name = 'products'
         settings = {
-            'number_of_shards': 1,
-            'number_of_replicas': 0,
+            'number_of_shards': settings.ELASTICSEARCH_PRODUCT_SHARDS,
         }
 
     class Django:
         model = Product
         fields = []
+        related_models = [ProductCategory]
+
+    class Meta:
+        source = source_meta()
+        # bump when prepared values change format (2: quantized price strings), es_boot_strap
+        # then reloads every document of a live index
+        meta = MetaField({'source_version': 2})
+
+    # set by es_boot_strap on an index it just created, which holds no copies to look for
+    fresh_index = False
+    copy_lookup_chunk = 500
 
     def prepare_id(self, instance):
         return str(instance.id)
 
+    def prepare_price(self, instance):
+        # the exact decimal string stays in _source, as the API renders it ("5.00"), whether
+        # the instance holds a Decimal('5') from a form or a float
+        field = Product._meta.get_field('price')
+        return str(field.to_python(instance.price).quantize(Decimal(1).scaleb(-field.decimal_places)))
+
+    def prepare_image(self, instance):
+        return instance.image.name or None
+
+    def prepare_category_ids_with_related(self, instance, related_to_ignore=None):
+        # categories are prefetched by get_queryset, the link being deleted is skipped
+        return [str(link.category_id) for link in instance.categories.all() if link != related_to_ignore]
+
+    def prepare_primary_category_id_with_related(self, instance, related_to_ignore=None):
+        return self.primary_category(instance, related_to_ignore)
+
+    @staticmethod
+    def primary_category(instance, related_to_ignore=None):
+        """Category of the product's earliest link, the one it is routed by."""
+        links = [link for link in instance.categories.all() if link != related_to_ignore]
+        return str(min(links, key=lambda link: (link.created_at, link.pk)).category_id) if links else None
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related('categories')
+
+    def _prepare_action(self, object_instance, action):
+        prepared = super()._prepare_action(object_instance, action)
+        if settings.ELASTICSEARCH_PRODUCT_ROUTING and action != 'delete' and prepared['_source']['primary_category_id']:
+            prepared['routing'] = prepared['_source']['primary_category_id']
+        return prepared
+
+    def _get_actions(self, object_list, action):
+        if not settings.ELASTICSEARCH_PRODUCT_ROUTING or self.fresh_index:
+            yield from super()._get_actions(object_list, action)
+            return
+        # A product whose primary category changed, or that is being deleted, may have a copy
+        # at another routing: remove it ahead of the new one. Looked up per chunk, so querysets
+        # and iterators still stream
+        object_list = iter(object_list)
+        while chunk := list(islice(object_list, self.copy_lookup_chunk)):
+            copies = self.indexed_routings(chunk)
+            for prepared in super()._get_actions(chunk, action):
+                found = copies.get(str(prepared['_id']), set())
+                for routing in (found if action == 'delete' else found - {prepared.get('routing')}):
+                    yield self.delete_action(prepared['_id'], routing)
+                if action != 'delete' or not found:
+                    yield prepared
+
+    def delete_action(self, pk, routing):
+        action = {'_op_type': 'delete', '_index': self._index._name, '_id': pk}
+        if routing:
+            action['routing'] = routing
+        return action
+
+    def indexed_routings(self, instances):
+        """
+        {id: routings of its indexed copies} for `instances`, from real-time gets at every
+        routing each product may have been indexed with.
+        """
+        candidates = {str(instance.pk): {None} for instance in instances}
+        links = ProductCategory.objects.filter(product__in=list(candidates)).values_list('product_id', 'category_id')
+        for product_id, category_id in links:
+            candidates[str(product_id)].add(str(category_id))
+        for instance in instances:
+            # a deleted product's links are gone by post_delete, products.signals keeps them.
+            # es_reconcile passes the routings it found copies at the same way
+            candidates[str(instance.pk)].update(getattr(instance, '_indexed_category_ids', ()))
+
+        docs = [
+            {'_id': pk, 'routing': routing} if routing else {'_id': pk}
+            for pk, routings in candidates.items() for routing in routings
+        ]
+        response = self._get_connection().mget(index=self._index._name, docs=docs, source=False)
+        copies = {}
+        for doc in response['docs']:
+            if doc.get('found'):
+                copies.setdefault(doc['_id'], set()).add(doc.get('_routing'))
+        return copies
+
+    @classmethod
+    def reindex(cls, product_ids, indexed_category_ids=None):
+        """
+        Index the current rows of `product_ids` in one bulk. `indexed_category_ids` maps
+        product ids to former categories their document may still be routed by.
+        """
+        products = list(cls().get_queryset().filter(pk__in=product_ids))
+        for product in products:
+            product._indexed_category_ids = (indexed_category_ids or {}).get(product.pk, ())
+        cls().update(products)
+
+    def routings(self, instances):
+        """{pk: routing} for partial updates of `instances`, empty when routing is off."""
+        if not settings.ELASTICSEARCH_PRODUCT_ROUTING:
+            return {}
+        links = ProductCategory.objects.filter(product__in=instances).order_by('created_at', 'pk')
+        routings = {}
+        for product_id, category_id in links.values_list('product_id', 'category_id'):
+            routings.setdefault(product_id, str(category_id))
+        return routings
+
+    @classmethod
+    def sources(cls, ids, fields):
+        """{id: _source limited to `fields`} of the indexed products among `ids`."""
+        es = cls._get_connection()
+        if settings.ELASTICSEARCH_PRODUCT_ROUTING:
+            # a routed document can't be fetched by id alone, ask every shard
+            response = es.search(
+                index=cls._index._name, query={'ids': {'values': ids}}, source_includes=fields, size=len(ids)
+            )
+            return {hit['_id']: hit['_source'] for hit in response['hits']['hits']}
+        response = es.mget(index=cls._index._name, ids=ids, source_includes=fields)
+        return {doc['_id']: doc['_source'] for doc in response['docs'] if doc.get('found')}
+
+    @classmethod
+    def in_category(cls, search, category_id):
+        """
+        Narrow a product search to products whose primary category is `category_id`,
+        which all sit on one shard when routing is on.
+        """
+        search = search.filter('term', primary_category_id=str(category_id))
+        if settings.ELASTICSEARCH_PRODUCT_ROUTING:
+            search = search.params(routing=str(category_id))
+        return search
+
+    def get_instances_from_related(self, related_instance):
+        if isinstance(related_instance, ProductCategory):
+            return related_instance.product
+
+    @classmethod
+    def more_like_this(cls, product_id, category_ids=(), size=10):
+        """
+        Products similar in title/description to `product_id`, boosted by shared categories.
+        `category_ids` lists the product's categories, primary one first.
+        """
+        like_doc = {'_index': cls._index._name, '_id': str(product_id)}
+        if settings.ELASTICSEARCH_PRODUCT_ROUTING and category_ids:
+            like_doc['routing'] = str(category_ids[0])
+        like = Q(
+            'more_like_this',
+            fields=['title', 'description'],
+            like=[like_doc],
+            min_term_freq=1,
+            min_doc_freq=1,
+            max_query_terms=25,
+        )
+        should = [Q('terms', category_ids=[str(pk) for pk in category_ids], boost=2.0)] if category_ids else []
+        return cls.search().query('bool', must=[like], should=should).source(False)[:size]
+
 @registry.register_document
 class CategoryDocument(Document):
-    id = fields.KeywordField()
+    id = id_field()
     title = fields.TextField(analyzer='standard')
-    description = fields.TextField(analyzer='standard')
+    description = body_text_field(analyzer='standard')
+    updated_at = fields.DateField()
 
     class Index:
         name = 'categories'
         settings = {
             'number_of_shards': 1,
-            'number_of_replicas': 0,
         }
 
     class Django:
         model = Category
         fields = []
 
+    class Meta:
+        source = source_meta()
+
     def prepare_id(self, instance):
         return str(instance.id)
+
+
+def catalog_search(document, query):
+    """
+    Title/description search used by the catalog search views, and replayed by
+    warm_search_cache. An empty query matches nothing.
+    """
+    s = document.search()
+    if not query:
+        return s[0:0]
+    # Prefer exact-ish phrase match, and allow a stricter multi_match fallback without fuzziness
+    phrase_q = Q(
+        'multi_match',
+        query=query,
+        fields=['title', 'description'],
+        type='phrase'
+    )
+    strict_q = Q(
+        'multi_match',
+        query=query,
+        fields=['title', 'description'],
+        operator='and'  # no fuzziness; requires all terms
+    )
+    return s.query('bool', should=[phrase_q, strict_q], minimum_should_match=1)
@@ -0,0 +1,65 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from conf.renderers import ORJSONRenderer, orjson
+from products.models import Product
+from products.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib and orjson rendering time for product list and search responses (no DB needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Rows per response.")
+        parser.add_argument("--repeat", type=int, default=20, help="Renders per measurement, best one is reported.")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed, ORJSONRenderer falls back to stdlib."))
+
+        rows, repeat = options["rows"], options["repeat"]
+        now = timezone.now()
+        products = [
+            Product(
+                id=uuid.uuid4(),
+                title=f"Product {i}",
+                description="Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 3,
+                price=Decimal("19.99") + i,
+                created_at=now,
+            )
+            for i in range(rows)
+        ]
+        payloads = {
+            "list": ProductSerializer(products, many=True).data,
+            "search": {
+                "count": rows,
+                "next": None,
+                "previous": None,
+                "results": [{"id": str(p.id), "title": p.title, "description": p.description} for p in products],
+            },
+            # what the lean read path hands over: raw UUID/Decimal/datetime values
+            "raw": [
+                {"id": p.id, "title": p.title, "price": p.price, "created_at": p.created_at} for p in products
+            ],
+        }
+
+        for name, data in payloads.items():
+            stdlib = self.measure(JSONRenderer(), data, repeat)
+            fast = self.measure(ORJSONRenderer(), data, repeat)
+            self.stdout.write(
+                f"{name:<7} {rows} rows: json {stdlib * 1000:8.2f} ms  orjson {fast * 1000:8.2f} ms  "
+                f"x{stdlib / fast:.1f}"
+            )
+
+    def measure(self, renderer, data, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            renderer.render(data)
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,72 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from products.models import Product
+from products.readers import product_list_reader
+from products.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare CPU per 1k rows of the ModelSerializer listing and the values_list() reader (no DB needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=10, help="Runs per path, best one is reported.")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        now = timezone.now()
+        # what the cursor returns for each path: full rows for from_db(), listed columns for the reader
+        model_fields = [f.attname for f in Product._meta.concrete_fields]
+        # every concrete column, timestamps set to now and the rest to their defaults
+        blank_row = {
+            f.attname: now if isinstance(f, models.DateTimeField) else f.get_default()
+            for f in Product._meta.concrete_fields
+        }
+        db_rows = [
+            {
+                **blank_row,
+                "id": uuid.uuid4(),
+                "title": f"Product {i}",
+                "description": "Lorem ipsum dolor sit amet " * 4,
+                "price": Decimal(f"{19 + i % 500}.99"),
+                "image": f"products/{i}.jpg" if i % 2 else "",
+            }
+            for i in range(rows)
+        ]
+        full_rows = [tuple(row[f] for f in model_fields) for row in db_rows]
+        listed_rows = [tuple(row[f] for f in product_list_reader.fields) for row in db_rows]
+
+        def serializer_path():
+            instances = [Product.from_db("default", model_fields, row) for row in full_rows]
+            return ProductSerializer(instances, many=True).data
+
+        def reader_path():
+            return product_list_reader.map(listed_rows)
+
+        expected = [dict(row) for row in serializer_path()]
+        actual = [{**row, "id": str(row["id"])} for row in reader_path()]
+        if expected != actual:
+            self.stdout.write(self.style.ERROR("Reader output differs from ProductSerializer output."))
+            return
+
+        serializer_time = self.measure(serializer_path, repeat)
+        reader_time = self.measure(reader_path, repeat)
+        per_k = 1000 / rows * 1000
+        self.stdout.write(
+            f"{rows} rows: serializer {serializer_time * per_k:.2f} ms/1k  "
+            f"reader {reader_time * per_k:.2f} ms/1k  x{serializer_time / reader_time:.1f}"
+        )
+
+    def measure(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl.connections import connections
+
+WORDS = (
+    "laptop phone tablet camera lens speaker headphones monitor keyboard mouse charger cable router printer "
+    "watch drone console controller microphone projector scanner battery adapter stand case cover bag desk "
+    "chair lamp fan heater kettle blender toaster mixer grill oven fridge washer dryer vacuum shaver brush"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare product search latency on 1 shard, N shards, and N shards routed by primary category, "
+        "on throwaway indices filled with synthetic products. Needs a few GB of disk at 1M docs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=1_000_000)
+        parser.add_argument("--categories", type=int, default=1000)
+        parser.add_argument("--shards", type=int, default=4, help="N, compared against a single shard.")
+        parser.add_argument("--queries", type=int, default=200, help="Queries per measurement.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true", help="Leave the bench_products_* indices in place.")
+
+    def handle(self, *args, **options):
+        es = connections.get_connection()
+        categories = [f"cat-{n}" for n in range(options["categories"])]
+        # a long tail of small categories behind a few big ones, as in a real catalog
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(categories))))
+        variants = [
+            ("1_shard", 1, False),
+            (f"{options['shards']}_shards", options["shards"], False),
+            (f"{options['shards']}_shards_routed", options["shards"], True),
+        ]
+
+        rng = random.Random(options["seed"])
+        queries = [
+            (rng.choice(WORDS), rng.choices(categories, cum_weights=cum_weights)[0]) for _ in range(options["queries"])
+        ]
+
+        for label, shards, routed in variants:
+            index = f"bench_products_{label}"
+            es.indices.delete(index=index, ignore_unavailable=True)
+            es.indices.create(
+                index=index,
+                settings={"number_of_shards": shards, "number_of_replicas": 0, "refresh_interval": "-1"},
+                mappings={"properties": {
+                    "title": {"type": "text"},
+                    "primary_category_id": {"type": "keyword"},
+                }},
+            )
+            started = time.perf_counter()
+            slow = es.options(request_timeout=600)
+            bulk(slow, self.actions(index, options["docs"], categories, cum_weights, routed, options["seed"]),
+                 chunk_size=5000)
+            es.indices.refresh(index=index)
+            slow.indices.forcemerge(index=index, max_num_segments=1)
+            loaded = time.perf_counter() - started
+
+            shard_docs = sorted(
+                int(row["docs"]) for row in es.cat.shards(index=index, format="json") if row["prirep"] == "p"
+            )
+            self.stdout.write(
+                f"{label}: indexed {options['docs']} docs in {loaded:.1f}s, docs per shard {shard_docs}"
+            )
+
+            global_search = self.measure(lambda word, category: es.search(
+                index=index, query={"match": {"title": word}}, size=10,
+            ), queries)
+            routing = (lambda category: {"routing": category}) if routed else (lambda category: {})
+            scoped_search = self.measure(lambda word, category: es.search(
+                index=index,
+                query={"bool": {"must": {"match": {"title": word}}, "filter": {"term": {"primary_category_id": category}}}},
+                size=10,
+                **routing(category),
+            ), queries)
+            scoped_count = self.measure(lambda word, category: es.count(
+                index=index, query={"term": {"primary_category_id": category}}, **routing(category),
+            ), queries)
+            for name, result in (("global search", global_search), ("category search", scoped_search),
+                                 ("category count", scoped_count)):
+                self.stdout.write(f"  {name:<16} {result}")
+
+            if not options["keep"]:
+                es.indices.delete(index=index)
+
+    @staticmethod
+    def actions(index, docs, categories, cum_weights, routed, seed):
+        # the same seed in every variant, so all indices hold the same products
+        rng = random.Random(seed + 1)
+        for n in range(docs):
+            category = rng.choices(categories, cum_weights=cum_weights)[0]
+            action = {
+                "_index": index,
+                "_id": str(n),
+                "_source": {"title": " ".join(rng.choices(WORDS, k=4)), "primary_category_id": category},
+            }
+            if routed:
+                action["routing"] = category
+            yield action
+
+    @staticmethod
+    def measure(run, queries):
+        # one untimed pass so every variant is measured with warm caches
+        for word, category in queries:
+            run(word, category)
+        took, wall, shards = [], [], 0
+        for word, category in queries:
+            started = time.perf_counter()
+            response = run(word, category)
+            wall.append((time.perf_counter() - started) * 1000)
+            took.append(response.get("took", 0))
+            shards = response["_shards"]["total"]
+        wall.sort()
+        return (
+            f"p50 {statistics.median(wall):.1f} ms, p99 {wall[min(len(wall) - 1, int(len(wall) * 0.99))]:.1f} ms, "
+            f"median took {statistics.median(took):.0f} ms, {shards} shard(s) per request"
+        )
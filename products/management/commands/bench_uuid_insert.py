@@ -0,0 +1,52 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from conf.ids import uuid7
+
+
+class Command(BaseCommand):
+    help = "Insert N rows keyed by uuid4 and by UUIDv7 into temp tables and compare throughput and index size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--batch", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark targets PostgreSQL.")
+
+        for name, generate in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+            self.run(name, generate, options["rows"], options["batch"])
+
+    def run(self, name, generate, rows, batch_size):
+        table = f"bench_{name}"
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            # pk plus a second key from the same generator, like a freshly created ProductCategory row
+            cursor.execute(
+                f"CREATE TEMP TABLE {table} (id uuid PRIMARY KEY, ref uuid NOT NULL, created_at timestamptz NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX {table}_ref ON {table} (ref)")
+
+            now = timezone.now()
+            started = time.perf_counter()
+            for offset in range(0, rows, batch_size):
+                values = [(generate(), generate(), now) for _ in range(min(batch_size, rows - offset))]
+                execute_values(cursor.cursor, f"INSERT INTO {table} (id, ref, created_at) VALUES %s", values)
+            elapsed = time.perf_counter() - started
+
+            cursor.execute(
+                "SELECT pg_relation_size(%s), pg_relation_size(%s)", [f"{table}_pkey", f"{table}_ref"]
+            )
+            pk_size, ref_size = cursor.fetchone()
+            cursor.execute(f"DROP TABLE {table}")
+
+        self.stdout.write(
+            f"{name}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), "
+            f"pk index {pk_size / 2**20:.1f} MiB, ref index {ref_size / 2**20:.1f} MiB"
+        )
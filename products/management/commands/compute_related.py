@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from elasticsearch_dsl import MultiSearch
+
+from products.documents import ProductDocument
+from products.management.commands.es_boot_strap import WATERMARK_OVERLAP
+from products.models import CatalogVersion, IndexWatermark, Product, RelatedProduct
+
+WATERMARK = "related_products"
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute the top-k more-like-this neighbours of each product into RelatedProduct. "
+        "Only products updated since the last run (category links included), and those listing one of "
+        "them as a neighbour, are recomputed unless --full is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--batch", type=int, default=100, help="Products per msearch round trip.")
+        parser.add_argument("--full", action="store_true", help="Recompute every product.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        synced_until = timezone.now()
+        products = Product.objects.prefetch_related("categories").only("id").order_by("pk")
+        watermark = None if options["full"] else IndexWatermark.objects.filter(index=WATERMARK).first()
+        if watermark is not None:
+            since = watermark.synced_until - WATERMARK_OVERLAP
+            # link writes touch Product.updated_at too, so category changes are picked up here
+            listing_changed = RelatedProduct.objects.filter(related__updated_at__gte=since).values("product_id")
+            products = products.filter(Q(updated_at__gte=since) | Q(pk__in=listing_changed))
+
+        batch, total = [], 0
+        for product in products.iterator(chunk_size=options["batch"]):
+            batch.append(product)
+            if len(batch) >= options["batch"]:
+                total += self.compute(batch, options["top_k"])
+                batch = []
+        total += self.compute(batch, options["top_k"])
+
+        if total:
+            CatalogVersion.bump("products")
+        IndexWatermark.objects.update_or_create(index=WATERMARK, defaults={"synced_until": synced_until})
+        self.stdout.write(self.style.SUCCESS(
+            f"Related products computed for {total} products in {time.perf_counter() - started:.2f}s."
+        ))
+
+    def compute(self, products, top_k):
+        if not products:
+            return 0
+        search = MultiSearch(index=ProductDocument._index._name)
+        for product in products:
+            links = sorted(product.categories.all(), key=lambda link: (link.created_at, link.pk))
+            category_ids = [link.category_id for link in links]
+            search = search.add(ProductDocument.more_like_this(product.pk, category_ids, size=top_k))
+
+        responses = list(zip(products, search.execute()))
+        # ES may still hold documents of deleted products, they would fail the FK
+        hit_ids = {hit.meta.id for _, response in responses for hit in response}
+        existing = {str(pk) for pk in Product.objects.filter(pk__in=hit_ids).values_list("pk", flat=True)}
+
+        rows = []
+        for product, response in responses:
+            hits = [hit for hit in response if hit.meta.id in existing]
+            rows.extend(
+                RelatedProduct(product_id=product.pk, related_id=hit.meta.id, rank=rank, score=hit.meta.score)
+                for rank, hit in enumerate(hits)
+            )
+            if not hits:
+                # computed, nothing similar: keeps the page off the live fallback
+                rows.append(RelatedProduct(product_id=product.pk, related_id=None, rank=0, score=0))
+
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product__in=products).delete()
+            RelatedProduct.objects.bulk_create(rows)
+        return len(products)
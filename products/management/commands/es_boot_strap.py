@@ -1,29 +1,161 @@
-from django.core.management.base import BaseCommand
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from elasticsearch import BadRequestError
+from conf.search import (
+    dynamic_index_settings, get_profile, index_settings, live_mapping, mapping_covers, mapping_options,
+)
 from products.documents import ProductDocument, CategoryDocument
-from products.models import Product, Category
+from products.models import CatalogVersion, IndexWatermark
+from users.documents import UserDocument
+
+LATENCY_SAMPLES = 20
+# CatalogVersion section whose cached search pages a reindex invalidates
+CATALOG_SECTIONS = {ProductDocument: "products", CategoryDocument: "categories"}
+# rows committed by transactions that started before the previous run are caught by re-reading a margin
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
 
 class Command(BaseCommand):
-    help = "Create Elasticsearch indices for Product and Category and index existing DB rows."
+    help = (
+        "Create Elasticsearch indices for Product, Category and User and index DB rows changed since "
+        "the last run (everything on first run, --full or --rebuild)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            default=settings.ELASTICSEARCH_INDEX_PROFILE,
+            help=(
+                "Index profile to serve with once the data is loaded (see ELASTICSEARCH_INDEX_PROFILES). "
+                "Mappings always follow ES_INDEX_PROFILE."
+            ),
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop and recreate the indices, needed for static settings such as the codec or mapping changes.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Reindex every row instead of only those updated since the stored watermark.",
+        )
+        parser.add_argument(
+            "--measure",
+            action="store_true",
+            help=f"Report index size and median latency of {LATENCY_SAMPLES} queries before and after the run.",
+        )
 
     def handle(self, *args, **options):
+        profile = options["profile"]
+        try:
+            get_profile(profile)
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        docs = (ProductDocument, CategoryDocument, UserDocument)
+        creates = options["rebuild"] or not all(doc._index.exists() for doc in docs)
+        if creates and mapping_options(profile) != mapping_options():
+            # the field helpers built the mappings from ES_INDEX_PROFILE at import
+            raise CommandError(
+                f"Profile '{profile}' maps fields differently than ES_INDEX_PROFILE "
+                f"'{settings.ELASTICSEARCH_INDEX_PROFILE}', and new indices would mix the two. "
+                f"Run with ES_INDEX_PROFILE={profile} instead."
+            )
+
+        for doc in docs:
+            self.bootstrap(doc, profile, options["rebuild"], options["full"], options["measure"])
+
+        self.stdout.write(self.style.SUCCESS("Elasticsearch indices bootstrapped and data indexed."))
+
+    def bootstrap(self, doc, profile, rebuild, full, measure=False):
+        index = doc._index
+        before = self.measure(doc) if measure and index.exists() else None
+
+        if rebuild and index.exists():
+            self.stdout.write(self.style.WARNING(f"Dropping index: {index._name}"))
+            index.delete()
+
         # Create indices if missing
-        for doc in (ProductDocument, CategoryDocument):
-            index = doc._index
-            if not index.exists():
-                self.stdout.write(self.style.WARNING(f"Creating index: {index._name}"))
-                index.create(ignore=400)
-
-        # Index existing DB data
-        # Product
-        self.stdout.write("Indexing Products...")
-        for obj in Product.objects.all():
-            ProductDocument().update(obj)
-        ProductDocument._index.refresh()
-
-        # Category
-        self.stdout.write("Indexing Categories...")
-        for obj in Category.objects.all():
-            CategoryDocument().update(obj)
-        CategoryDocument._index.refresh()
-
-        self.stdout.write(self.style.SUCCESS("Elasticsearch indices bootstrapped and data indexed."))
\ No newline at end of file
+        created = not index.exists()
+        if created:
+            self.stdout.write(self.style.WARNING(f"Creating index: {index._name} ({profile})"))
+            index.settings(**index_settings(profile))
+            index.create(ignore=400)
+            full = True
+        else:
+            # new fields can be added to a live index, changed ones need --rebuild
+            mapping = doc._doc_type.mapping.to_dict()
+            outdated = not mapping_covers(mapping, live_mapping(index))
+            try:
+                index.put_mapping(body=mapping)
+            except BadRequestError as exc:
+                raise CommandError(f"Mapping of {index._name} changed incompatibly, rerun with --rebuild: {exc}")
+            if outdated and not full:
+                # documents indexed before would lack the new fields (or carry an old _source
+                # format) until their row changes
+                self.stdout.write(self.style.WARNING(f"Mapping of {index._name} changed, reindexing every row"))
+                full = True
+
+        watermark = None if full else IndexWatermark.objects.filter(index=index._name).first()
+        queryset = doc().get_queryset()
+        if watermark is not None:
+            queryset = queryset.filter(updated_at__gte=watermark.synced_until - WATERMARK_OVERLAP)
+        synced_until = timezone.now()
+
+        # a full load runs with refresh off, then the index is switched to the serving profile
+        bulk_settings = dynamic_index_settings("bulk_load")
+        if watermark is None:
+            index.put_settings(settings={"index": bulk_settings})
+
+        label = doc.django.model._meta.verbose_name_plural
+        self.stdout.write(f"Indexing {label} ({'full' if watermark is None else f'since {watermark.synced_until}'})...")
+        started = time.perf_counter()
+        document = doc()
+        if hasattr(document, "fresh_index"):
+            # routed documents (ProductDocument) skip looking for copies at other routings
+            document.fresh_index = created
+        indexed, _ = document.update(queryset.iterator(chunk_size=2000), refresh=False)
+        elapsed = time.perf_counter() - started
+
+        if watermark is None:
+            index.put_settings(settings={"index": dynamic_index_settings(profile, reset=bulk_settings)})
+        index.refresh()
+        IndexWatermark.objects.update_or_create(index=index._name, defaults={"synced_until": synced_until})
+        if doc in CATALOG_SECTIONS and (created or indexed):
+            # otherwise cached search pages keep revalidating against the old results
+            CatalogVersion.bump(CATALOG_SECTIONS[doc])
+
+        if not measure:
+            self.stdout.write(f"  indexed {indexed} docs in {elapsed:.2f}s")
+            return
+        after = self.measure(doc)
+        self.stdout.write(f"  indexed in {elapsed:.2f}s, {after['docs']} docs in index")
+        self.report(before, after)
+
+    def measure(self, doc):
+        index = doc._index
+        stats = index.stats(metric="store,docs")["_all"]["primaries"]
+        took = []
+        for _ in range(LATENCY_SAMPLES):
+            response = doc.search().query("match_all").params(request_cache=False)[:10].execute()
+            took.append(response.took)
+        return {
+            "docs": stats["docs"]["count"],
+            "size": stats["store"]["size_in_bytes"],
+            "latency": statistics.median(took),
+        }
+
+    def report(self, before, after):
+        def fmt(m):
+            return f"{m['size'] / 1024:.1f} KiB, median query {m['latency']} ms"
+
+        if before is not None:
+            self.stdout.write(f"  before: {fmt(before)}")
+        self.stdout.write(f"  after:  {fmt(after)}")
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+from elasticsearch.helpers import bulk
+
+from products.documents import CategoryDocument, ProductDocument
+from products.management.commands.es_boot_strap import CATALOG_SECTIONS
+from products.models import CatalogVersion
+from users.documents import UserDocument
+
+DOCUMENTS = {
+    "products": ProductDocument,
+    "categories": CategoryDocument,
+    "users": UserDocument,
+}
+_DONE = object()
+
+
+class Command(BaseCommand):
+    help = (
+        "Find drift between Postgres and Elasticsearch (missing, stale and orphaned documents) by "
+        "merging both sides sorted by id, and bulk-repair it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("indices", nargs="*", help=f"Indices to check ({', '.join(DOCUMENTS)}), all by default.")
+        parser.add_argument("--batch", type=int, default=1000, help="Stream and repair batch size.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report drift.")
+        parser.add_argument(
+            "--no-parallel",
+            action="store_true",
+            help="Read Postgres on the calling thread (and connection), e.g. inside a test transaction.",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["indices"]) - set(DOCUMENTS)
+        if unknown:
+            raise CommandError(f"Unknown indices: {', '.join(sorted(unknown))}")
+        for name in options["indices"] or DOCUMENTS:
+            self.reconcile(DOCUMENTS[name], options["batch"], options["dry_run"], not options["no_parallel"])
+
+    def reconcile(self, doc, batch, dry_run, parallel=True):
+        started = time.perf_counter()
+        stats = {"checked": 0, "missing": 0, "stale": 0, "duplicated": 0, "orphaned": 0}
+        # pk -> routings its copies were found at, so the reindex can find and drop the extra ones
+        reindex, delete = {}, []
+
+        def flush(force=False):
+            if dry_run:
+                reindex.clear()
+                delete.clear()
+                return
+            if reindex and (force or len(reindex) >= batch):
+                instances = list(doc().get_queryset().filter(pk__in=list(reindex)))
+                for instance in instances:
+                    instance._indexed_category_ids = reindex[str(instance.pk)]
+                doc().update(instances, refresh=False)
+                reindex.clear()
+            if delete and (force or len(delete) >= batch):
+                actions = (
+                    {"_op_type": "delete", "_index": doc._index._name, "_id": pk, **({"routing": routing} if routing else {})}
+                    for pk, routing in delete
+                )
+                bulk(doc._get_connection(), actions, raise_on_error=False)
+                delete.clear()
+
+        db_rows = self.stream(self.db_rows, doc, batch, parallel)
+        es_rows = self.copies(self.stream(self.es_rows, doc, batch, parallel))
+        db_row, es_row = next(db_rows, None), next(es_rows, None)
+        while db_row is not None or es_row is not None:
+            if es_row is None or (db_row is not None and db_row[0] < es_row[0]):
+                stats["missing"] += 1
+                reindex[db_row[0]] = []
+                db_row = next(db_rows, None)
+            elif db_row is None or es_row[0] < db_row[0]:
+                stats["orphaned"] += 1
+                delete.extend((es_row[0], routing) for _, routing in es_row[1])
+                es_row = next(es_rows, None)
+            else:
+                pk, copies = es_row
+                if len(copies) > 1:
+                    # copies at several routings (ProductDocument): which one is current is
+                    # only known from the DB, the reindex keeps that one and drops the rest
+                    stats["duplicated"] += 1
+                    reindex[pk] = [routing for _, routing in copies if routing]
+                elif copies[0][0] != db_row[1]:
+                    stats["stale"] += 1
+                    reindex[pk] = [routing for _, routing in copies if routing]
+                db_row, es_row = next(db_rows, None), next(es_rows, None)
+            stats["checked"] += 1
+            flush()
+        flush(force=True)
+        if not dry_run:
+            doc._index.refresh()
+            if doc in CATALOG_SECTIONS and any(value for key, value in stats.items() if key != "checked"):
+                # repaired documents change search results, retire the cached pages
+                CatalogVersion.bump(CATALOG_SECTIONS[doc])
+
+        summary = ", ".join(f"{value} {key}" for key, value in stats.items())
+        self.stdout.write(f"{doc._index._name}: {summary} in {time.perf_counter() - started:.2f}s"
+                          f"{' (dry run)' if dry_run else ''}")
+
+    def stream(self, producer, doc, batch, parallel=True):
+        """
+        Run `producer` in a thread, handing its chunks over through a bounded queue, or
+        inline without `parallel`.
+        """
+        if not parallel:
+            for chunk in producer(doc, batch):
+                yield from chunk
+            return
+        chunks = queue.Queue(maxsize=4)
+
+        def run():
+            try:
+                for chunk in producer(doc, batch):
+                    chunks.put(chunk)
+            except Exception as exc:
+                chunks.put(exc)
+            finally:
+                # this thread's connection
+                connection.close()
+                chunks.put(_DONE)
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield from chunk
+
+    @staticmethod
+    def copies(rows):
+        """Group the sorted (id, updated_at, routing) ES rows into (id, [(updated_at, routing), ...])."""
+        for pk, group in groupby(rows, key=itemgetter(0)):
+            yield pk, [(updated_at, routing) for _, updated_at, routing in group]
+
+    def db_rows(self, doc, batch):
+        # Postgres orders uuids bytewise, which matches the order of their hex strings in ES
+        rows = doc().get_queryset().order_by("pk").values_list("pk", "updated_at")
+        chunk = []
+        for pk, updated_at in rows.iterator(chunk_size=batch):
+            chunk.append((str(pk), updated_at))
+            if len(chunk) >= batch:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def es_rows(self, doc, batch):
+        es = doc._get_connection()
+        pit = es.open_point_in_time(index=doc._index._name, keep_alive="2m")
+        search = doc.search().extra(pit={"id": pit["id"], "keep_alive": "2m"}).index()
+        search = search.sort("id").source(["updated_at"])[:batch]
+        try:
+            while True:
+                response = search.execute()
+                if not response.hits:
+                    return
+                # routed documents (ProductDocument) can only be deleted at their routing
+                yield [(hit.meta.sort[0], self.es_timestamp(hit), getattr(hit.meta, "routing", None)) for hit in response]
+                search = search.extra(search_after=list(response.hits[-1].meta.sort))
+        finally:
+            es.close_point_in_time(id=pit["id"])
+
+    @staticmethod
+    def es_timestamp(hit):
+        value = getattr(hit, "updated_at", None)
+        # Date fields usually come back deserialized, raw strings if the mapping didn't match
+        return parse_datetime(value) if isinstance(value, str) else value
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from conf.ids import uuid7_from_datetime
+from products.models import CatalogVersion, Category, Product, ProductCategory
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite legacy uuid4 primary keys of products, categories and their links as UUIDv7 "
+        "derived from created_at, updating every foreign key pointing at them. Users are left "
+        "alone: their ids are baked into issued JWTs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would change.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Rekeying relies on deferred FK constraints and UPDATE ... FROM, PostgreSQL only.")
+
+        with transaction.atomic():
+            # Django creates FK constraints DEFERRABLE INITIALLY DEFERRED, checked at commit
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+                for model in (Product, Category, ProductCategory):
+                    changed = self.rekey(cursor, model, options["dry_run"])
+                    self.stdout.write(f"{model._meta.label}: {changed} rows {'to rekey' if options['dry_run'] else 'rekeyed'}")
+
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+                return
+            CatalogVersion.bump("products")
+            CatalogVersion.bump("categories")
+
+        self.stdout.write(self.style.WARNING(
+            "Elasticsearch documents are keyed by pk, run `manage.py es_boot_strap --rebuild`."
+        ))
+
+    def rekey(self, cursor, model, dry_run):
+        table = connection.ops.quote_name(model._meta.db_table)
+        pk = connection.ops.quote_name(model._meta.pk.column)
+        cursor.execute("CREATE TEMP TABLE rekey_map (old_id uuid PRIMARY KEY, new_id uuid NOT NULL) ON COMMIT DROP")
+
+        changed = 0
+        batch = []
+        for old_id, created_at in model.objects.values_list("pk", "created_at").iterator(chunk_size=BATCH_SIZE):
+            if old_id.version == 7:
+                continue
+            batch.append((old_id, uuid7_from_datetime(created_at)))
+            if len(batch) >= BATCH_SIZE:
+                changed += self.flush(cursor, batch)
+        changed += self.flush(cursor, batch)
+
+        if changed and not dry_run:
+            # every FK pointing at this model, including ones added later
+            for rel in model._meta.related_objects:
+                if rel.many_to_many or not rel.field.concrete:
+                    continue
+                related_table = connection.ops.quote_name(rel.related_model._meta.db_table)
+                column = connection.ops.quote_name(rel.field.column)
+                cursor.execute(
+                    f"UPDATE {related_table} r SET {column} = m.new_id FROM rekey_map m WHERE r.{column} = m.old_id"
+                )
+            cursor.execute(f"UPDATE {table} t SET {pk} = m.new_id FROM rekey_map m WHERE t.{pk} = m.old_id")
+
+        cursor.execute("DROP TABLE rekey_map")
+        return changed
+
+    def flush(self, cursor, batch):
+        if not batch:
+            return 0
+        cursor.executemany("INSERT INTO rekey_map (old_id, new_id) VALUES (%s, %s)", batch)
+        count = len(batch)
+        batch.clear()
+        return count
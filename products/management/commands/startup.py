@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from elasticsearch_dsl.connections import connections as es_connections
+
+from conf.search import live_mapping, mapping_covers
+from products.documents import CategoryDocument, ProductDocument
+from users.documents import UserDocument
+
+DOCUMENTS = (ProductDocument, CategoryDocument, UserDocument)
+# pg_advisory_lock key shared by every replica, "tafk" in ASCII
+STARTUP_LOCK = 0x7461666B
+
+
+class Command(BaseCommand):
+    help = (
+        "Container start-up: wait for Postgres and Elasticsearch, then, under a cluster-wide advisory lock, "
+        "migrate and bootstrap the indices only if they are out of date. Prints the time spent in each phase."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for Postgres and Elasticsearch.")
+
+    def handle(self, *args, **options):
+        self.timings = []
+        with self.phase("wait"):
+            self.wait(options["timeout"])
+        with self.lock():
+            with self.phase("migrate"):
+                self.migrate()
+            with self.phase("es_bootstrap"):
+                self.bootstrap()
+        summary = ", ".join(f"{name} {elapsed:.2f}s{f' ({note})' if note else ''}" for name, elapsed, note in self.timings)
+        self.stdout.write(self.style.SUCCESS(f"Startup finished: {summary}"))
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        # a phase can describe its outcome by setting self.note
+        self.note = ""
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - started, self.note))
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            db = pool.submit(self.poll, "Postgres", self.db_ready, deadline)
+            es = pool.submit(self.poll, "Elasticsearch", self.es_ready, deadline)
+            self.note = f"postgres {db.result():.2f}s, elasticsearch {es.result():.2f}s"
+
+    def poll(self, name, check, deadline):
+        started, delay = time.monotonic(), 0.1
+        while True:
+            try:
+                if check():
+                    return time.monotonic() - started
+            except Exception as exc:
+                error = exc
+            else:
+                error = "not ready"
+            if time.monotonic() + delay > deadline:
+                raise CommandError(f"{name} not reachable: {error}")
+            time.sleep(delay)
+            delay = min(delay * 2, 1)
+
+    @staticmethod
+    def db_ready():
+        connection = connections[DEFAULT_DB_ALIAS]
+        try:
+            connection.ensure_connection()
+            return True
+        finally:
+            # the polling thread's connection
+            connection.close()
+
+    @staticmethod
+    def es_ready():
+        return es_connections.get_connection().cluster.health(wait_for_status="yellow", timeout="1s")["status"] != "red"
+
+    @contextmanager
+    def lock(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != "postgresql":
+            yield
+            return
+        # replicas that start together queue here, then find the work already done
+        with self.phase("lock"), connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [STARTUP_LOCK])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [STARTUP_LOCK])
+
+    def migrate(self):
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.note = "up to date"
+            return
+        call_command("migrate", interactive=False, stdout=self.stdout)
+        self.note = f"applied {len(plan)}"
+
+    def bootstrap(self):
+        stale = [doc._index._name for doc in DOCUMENTS if not self.in_sync(doc)]
+        if not stale:
+            self.note = "in sync"
+            return
+        try:
+            call_command("es_boot_strap", stdout=self.stdout)
+        except Exception as exc:
+            # serving with a stale index beats not serving, the next start or es_reconcile repairs it
+            self.stderr.write(self.style.WARNING(f"es_boot_strap failed: {exc}"))
+            self.note = f"failed for {', '.join(stale)}"
+        else:
+            self.note = f"synced {', '.join(stale)}"
+
+    @classmethod
+    def in_sync(cls, doc):
+        index = doc._index
+        if not index.exists():
+            return False
+        if not mapping_covers(doc._doc_type.mapping.to_dict(), live_mapping(index)):
+            return False
+        return doc.search().count() == doc().get_queryset().count()
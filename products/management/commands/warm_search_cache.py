@@ -0,0 +1,107 @@
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from elasticsearch_dsl import MultiSearch
+
+from products.documents import CategoryDocument, ProductDocument, catalog_search
+from products.models import SearchQueryDaily
+
+SEARCHES = {
+    "products": (ProductDocument, "product-search"),
+    "categories": (CategoryDocument, "category-search"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the most frequent recent search queries (SearchQueryDaily) so the first users after a deploy "
+        "don't pay for cold Elasticsearch caches. With --url the queries go through the running app instead, "
+        "which also warms its workers and any caching proxy in front of it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=100, help="Queries to replay per index.")
+        parser.add_argument("--days", type=int, default=7, help="Look-back window for query counts.")
+        parser.add_argument("--batch", type=int, default=50, help="Queries per msearch round trip.")
+        parser.add_argument("--url", help="Base URL of the running app, e.g. http://127.0.0.1:8000.")
+        parser.add_argument("--wait", type=float, default=60, help="Seconds to wait for --url to answer.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Parallel requests with --url.")
+
+    def handle(self, *args, **options):
+        since = timezone.localdate() - timedelta(days=options["days"])
+        if options["url"]:
+            self.wait_for(options["url"], options["wait"])
+        for index, (doc, url_name) in SEARCHES.items():
+            queries = list(
+                SearchQueryDaily.objects.filter(index=index, day__gte=since)
+                .values("query")
+                .annotate(total=Sum("count"))
+                .order_by("-total")
+                .values_list("query", flat=True)[: options["top"]]
+            )
+            if not queries:
+                self.stdout.write(f"{index}: no recorded queries")
+                continue
+            started = time.perf_counter()
+            if options["url"]:
+                took = self.replay_http(options["url"], reverse(url_name), queries, options["concurrency"])
+            else:
+                took = self.replay_es(doc, queries, options["batch"])
+            self.stdout.write(
+                f"{index}: replayed {len(queries)} queries in {time.perf_counter() - started:.2f}s, "
+                f"p50 {statistics.median(took):.0f} ms, p99 {self.p99(took):.0f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS("Search caches warmed."))
+
+    def replay_es(self, doc, queries, batch):
+        took = []
+        for start in range(0, len(queries), batch):
+            search = MultiSearch(index=doc._index._name)
+            for query in queries[start:start + batch]:
+                # the same request the search view sends
+                search = search.add(catalog_search(doc, query))
+            took.extend(response.took for response in search.execute())
+        return took
+
+    def replay_http(self, base_url, path, queries, concurrency):
+        def get(query):
+            url = f"{base_url.rstrip('/')}{path}?{urllib.parse.urlencode({'q': query})}"
+            request = urllib.request.Request(url, headers={"Accept": "application/json", "X-Search-Warmup": "1"})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError) as exc:
+                self.stderr.write(f"  {url}: {exc}")
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(get, queries))
+
+    def wait_for(self, base_url, timeout):
+        deadline, delay = time.monotonic() + timeout, 0.1
+        while True:
+            try:
+                urllib.request.urlopen(base_url, timeout=2).close()
+                return
+            except urllib.error.HTTPError:
+                # any HTTP answer means the server is up
+                return
+            except (urllib.error.URLError, OSError) as exc:
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(f"{base_url} not reachable: {exc}")
+            time.sleep(delay)
+            delay = min(delay * 2, 1)
+
+    @staticmethod
+    def p99(values):
+        return sorted(values)[min(len(values) - 1, int(len(values) * 0.99))]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:56
+
+import conf.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='id',
+            field=models.UUIDField(default=conf.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='id',
+            field=models.UUIDField(default=conf.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='productcategory',
+            name='id',
+            field=models.UUIDField(default=conf.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('index', models.CharField(max_length=50)),
+                ('query', models.CharField(max_length=255)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('day', 'index', 'query')},
+            },
+        ),
+    ]
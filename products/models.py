@@ -1,31 +1,61 @@
-import uuid
-from django.db import models
+from django.db import connections, models, router
 from django.utils import timezone
 
+from conf.ids import uuid7
 
-class Product(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+class TrackedFieldsMixin:
+    """
+    Remembers field values as loaded from the DB, so a save can tell which fields it
+    actually changed (used to send partial updates to ES).
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """attnames changed since load or last save, None when unknown (instance never loaded)."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return {name for name, value in loaded.items() if getattr(self, name) != value}
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have seen the diff by now, start tracking from the saved state
+        self._loaded_values = {
+            f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields if f.attname in self.__dict__
+        }
+
+
+class Product(TrackedFieldsMixin, models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
 
-class Category(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+class Category(TrackedFieldsMixin, models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
 
 class ProductCategory(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='categories')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     created_at = models.DateTimeField(default=timezone.now)
@@ -34,4 +64,87 @@ class ProductCategory(models.Model):
         unique_together = ('product', 'category')  # prevents duplicates
 
     def __str__(self):
-        return f"{self.product.title} - {self.category.title}"
+        # titles only when already loaded (select_related), never two queries per row
+        if self._meta.get_field('product').is_cached(self) and self._meta.get_field('category').is_cached(self):
+            return f"{self.product.title} - {self.category.title}"
+        return f"{self.product_id} - {self.category_id}"
+
+
+class RelatedProduct(models.Model):
+    """
+    Precomputed "more like this" neighbours per product, refreshed by `manage.py compute_related`.
+    A single row without `related` marks a product computed with no neighbours.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_products')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', null=True)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('product', 'rank')  # also the index product pages read through
+
+    def __str__(self):
+        return f"{self.product_id} #{self.rank} -> {self.related_id}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Generation counter per catalog section ("products", "categories"), bumped on every
+    write. Reads use it to answer conditional GETs without touching ES or the rows.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    generation = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name}@{self.generation}"
+
+    @classmethod
+    def bump(cls, name):
+        now = timezone.now()
+        connection = connections[router.db_for_write(cls)]
+        if connection.vendor != 'postgresql':
+            updated = cls.objects.filter(name=name).update(generation=models.F('generation') + 1, updated_at=now)
+            if not updated:
+                cls.objects.get_or_create(name=name, defaults={'generation': 1, 'updated_at': now})
+            return
+        # one statement, so two first writers can't both end up at generation 1
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ("name", "generation", "updated_at") VALUES (%s, 1, %s) '
+                f'ON CONFLICT ("name") DO UPDATE SET "generation" = {table}."generation" + 1, '
+                f'"updated_at" = EXCLUDED."updated_at"',
+                [name, now],
+            )
+
+    @classmethod
+    def current(cls, name):
+        """(generation, updated_at) or None if nothing was written yet."""
+        return cls.objects.filter(name=name).values_list('generation', 'updated_at').first()
+
+
+class IndexWatermark(models.Model):
+    """Per-index sync point: es_boot_strap only reindexes rows updated since `synced_until`."""
+    index = models.CharField(max_length=100, primary_key=True)
+    synced_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.index}@{self.synced_until.isoformat()}"
+
+
+class SearchQueryDaily(models.Model):
+    """
+    Per-day rollup of normalized search queries, fed by products.analytics.search_recorder.
+    Counts are estimates when the recorder samples.
+    """
+    day = models.DateField()
+    index = models.CharField(max_length=50)
+    query = models.CharField(max_length=255)
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'index', 'query')  # also the upsert's conflict target
+
+    def __str__(self):
+        return f"{self.day} {self.index}:{self.query} x{self.count}"
@@ -0,0 +1,80 @@
+"""
+Read-only listing path: values_list() tuples mapped straight to response rows.
+
+Output matches the corresponding ModelSerializer (without a request in context), but
+no model instances are built and no serializer fields run per row. Serializers stay
+on the write path where validation is needed.
+"""
+from django.core.files.storage import default_storage
+from django.utils.encoding import filepath_to_uri
+from django.utils.functional import cached_property
+
+# converter placeholder for File/ImageField columns, resolved to the storage URL
+MEDIA_URL = object()
+
+
+def media_url_converter():
+    # FileSystemStorage.url() without the per-row urljoin, base_url resolved once
+    base_url = default_storage.base_url
+
+    def to_url(name):
+        return base_url + filepath_to_uri(name).lstrip('/') if name else None
+
+    return to_url
+
+
+def compile_row_mapper(columns):
+    """
+    Generate `lambda row: {'id': row[0], 'price': c3(row[3]), ...}` for (key, converter)
+    pairs in values_list() order, a plain dict display being the cheapest way to build rows.
+    """
+    namespace = {}
+    items = []
+    for i, (key, convert) in enumerate(columns):
+        if convert is None:
+            items.append(f"{key!r}: row[{i}]")
+        else:
+            namespace[f"c{i}"] = convert
+            items.append(f"{key!r}: c{i}(row[{i}])")
+    return eval(f"lambda row: {{{', '.join(items)}}}", namespace)
+
+
+class ListReader:
+    def __init__(self, *columns):
+        self.columns = columns
+        self.fields = [field for field, _ in columns]
+
+    @cached_property
+    def mapper(self):
+        media_url = media_url_converter()
+        return compile_row_mapper(
+            [(field, media_url if convert is MEDIA_URL else convert) for field, convert in self.columns]
+        )
+
+    def map(self, rows):
+        mapper = self.mapper
+        return [mapper(row) for row in rows]
+
+    def __call__(self, queryset, prefix=''):
+        """`prefix` reads the columns through a relation, e.g. 'related__'."""
+        return self.map(queryset.values_list(*(prefix + field for field in self.fields)))
+
+    def map_source(self, pk, source):
+        """Row from an ES document `_source`, the first column being the id (`_id`)."""
+        return self.mapper((pk, *[source.get(field) for field in self.fields[1:]]))
+
+
+# same keys as ProductSerializer / CategorySerializer
+product_list_reader = ListReader(
+    ('id', None),
+    ('title', None),
+    ('description', None),
+    ('price', str),
+    ('image', MEDIA_URL),
+)
+category_list_reader = ListReader(
+    ('id', None),
+    ('title', None),
+    ('description', None),
+    ('image', MEDIA_URL),
+)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Product, Category
+from .models import Product, Category, ProductCategory
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -11,3 +11,27 @@ class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'title', 'description', 'image']
+
+
+class ProductPriceSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
+class ProductBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=500)
+
+
+class ProductCategoryLinkSerializer(serializers.ModelSerializer):
+    product_title = serializers.CharField(source='product.title', read_only=True)
+    category_title = serializers.CharField(source='category.title', read_only=True)
+
+    class Meta:
+        model = ProductCategory
+        fields = ['id', 'product_id', 'product_title', 'category_id', 'category_title', 'created_at']
+
+
+class ProductCategoryBulkSerializer(serializers.Serializer):
+    """Every product in `product_ids` gets (or loses) every category in `category_ids`."""
+    product_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=1000)
+    category_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=100)
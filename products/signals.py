@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django_elasticsearch_dsl.apps import DEDConfig
+
+from conf.search import signal_updates_deferred
+
+from .analytics import search_recorder
+from .cache import product_cache
+from .documents import ProductDocument
+from .models import CatalogVersion, Category, Product, ProductCategory
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def bump_products_version(sender, **kwargs):
+    # bulk writes inside defer_signal_updates() bump once themselves
+    if not signal_updates_deferred():
+        CatalogVersion.bump('products')
+
+
+def touch_linked_product(link):
+    """
+    Move the product's updated_at: categories feed its document and neighbours, which
+    incremental syncs and compute_related pick up by it. Bulk link writes touch theirs themselves.
+    """
+    now = timezone.now()
+    Product.objects.filter(pk=link.product_id).update(updated_at=now)
+    if ProductCategory._meta.get_field('product').is_cached(link):
+        link.product.updated_at = now
+
+
+@receiver(pre_save, sender=ProductCategory)
+def touch_product_on_link_save(sender, instance, **kwargs):
+    # ahead of the related reindex on post_save, which then carries the new timestamp
+    if not signal_updates_deferred():
+        touch_linked_product(instance)
+
+
+@receiver(pre_delete, sender=ProductCategory)
+def touch_product_on_link_delete(sender, instance, origin=None, **kwargs):
+    # a cascade from the product's own delete needs nothing
+    if signal_updates_deferred() or isinstance(origin, Product):
+        return
+    touch_linked_product(instance)
+    if DEDConfig.autosync_enabled():
+        # the index took the product in the related reindex that ran just before this
+        # receiver, send it again with the new timestamp once the link is gone
+        product_id, category_id = instance.product_id, str(instance.category_id)
+        transaction.on_commit(lambda: ProductDocument.reindex([product_id], {product_id: [category_id]}))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_categories_version(sender, **kwargs):
+    CatalogVersion.bump('categories')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    # once ES has the new row and the write is committed, or a concurrent batch read
+    # could put the old one back
+    pk = str(instance.pk)
+    transaction.on_commit(lambda: product_cache.discard(pk))
+
+
+@receiver(pre_delete, sender=Product)
+def remember_routing_candidates(sender, instance, **kwargs):
+    # the cascade removes the category links before post_delete drops the ES document,
+    # keep them so ProductDocument can find the shard the document was routed to
+    if settings.ELASTICSEARCH_PRODUCT_ROUTING:
+        instance._indexed_category_ids = [str(pk) for pk in instance.categories.values_list('category_id', flat=True)]
+
+
+@receiver(request_finished)
+def flush_search_queries(sender, **kwargs):
+    # after the response went out, so the batch write never delays one
+    if search_recorder.due():
+        search_recorder.flush()
@@ -1,10 +1,31 @@
+import io
+import json
 import time
-from django.test import TestCase
+import uuid
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Product, Category, ProductCategory
-from .documents import ProductDocument, CategoryDocument
+from .analytics import SearchQueryRecorder
+from .cache import product_cache
+from .management.commands.startup import Command as StartupCommand
+from .models import CatalogVersion, Product, Category, ProductCategory, RelatedProduct, SearchQueryDaily
+from .views import ProductListCreateView, search_export
+from .documents import ProductDocument, CategoryDocument, catalog_search
+from conf.middleware import ReplicaReadsMiddleware
+from conf.parsers import ORJSONParser
+from conf.routers import use_replicas
+from conf.search import indexed_changes
+from conf.renderers import NDJSONRenderer, ORJSONRenderer
 
 
 class ProductTests(TestCase):
@@ -40,6 +61,10 @@ class ProductTests(TestCase):
         # Verify index has exactly 3 docs (debug)
         self.assertEqual(ProductDocument.search().query("match_all").count(), 3)
 
+    def login_staff(self):
+        staff = get_user_model().objects.create_user(email='staff@example.com', password='StrongPass123!', is_staff=True)
+        self.client.force_authenticate(staff)
+
     def test_product_search(self):
         url = reverse('product-search')
         response = self.client.get(url, {'q': 'high-end gaming'})  # Unique to product1
@@ -69,6 +94,215 @@ class ProductTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.json()), 3)
 
+    def test_product_list_keyset_pages(self):
+        url = reverse('product-list-create')
+        first = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual(len(first), 2)
+        rest = self.client.get(url, {'after': first[-1]['id'], 'limit': 2}).json()
+        self.assertEqual(len(rest), 1)
+        self.assertEqual(
+            [p['id'] for p in first + rest],
+            [str(pk) for pk in Product.objects.order_by('id').values_list('id', flat=True)],
+        )
+
+    def test_new_ids_are_time_ordered(self):
+        ids = [p.id for p in (self.product1, self.product2, self.product3)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(pk.version == 7 for pk in ids))
+
+    def test_reconcile_repairs_missing_and_orphaned_docs(self):
+        ProductDocument().update(self.product1, action='delete', refresh=True)
+        orphan = Product(title='Ghost', description='Not in the database', price=1)
+        ProductDocument().update(orphan, refresh=True)
+
+        version = CatalogVersion.current('products')
+
+        # the test transaction's rows are only visible on this thread's connection
+        call_command('es_reconcile', 'products', '--no-parallel', stdout=io.StringIO())
+
+        ProductDocument._index.refresh()
+        ids = {hit.meta.id for hit in ProductDocument.search().query('match_all').execute()}
+        self.assertEqual(ids, {str(p.id) for p in Product.objects.all()})
+        self.assertGreater(CatalogVersion.current('products')[0], version[0])
+
+    def test_price_only_save_sends_partial_update(self):
+        product = Product.objects.get(pk=self.product1.pk)
+        product.price = 899.00
+        product.save()
+        self.assertEqual(product.changed_fields(), set())
+
+        ProductDocument._index.refresh()
+        doc = ProductDocument.get(id=str(product.pk))
+        self.assertEqual(doc.price, 899.0)
+        self.assertEqual(doc.title, 'Laptop')
+
+    def test_bulk_price_update(self):
+        self.login_staff()
+        url = reverse('product-price-bulk-update')
+        payload = [
+            {'id': str(self.product1.pk), 'price': '10.00'},
+            {'id': str(self.product2.pk), 'price': '499.99'},  # unchanged
+            {'id': str(uuid.uuid4()), 'price': '1.00'},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data['updated'], data['unchanged'], len(data['missing'])), (1, 1, 1))
+
+        self.product1.refresh_from_db()
+        self.assertEqual(str(self.product1.price), '10.00')
+        ProductDocument._index.refresh()
+        self.assertEqual(ProductDocument.get(id=str(self.product1.pk)).price, 10.0)
+
+    def test_bulk_price_update_requires_staff(self):
+        response = self.client.post(reverse('product-price-bulk-update'), [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_batch_fetch_serves_from_es_and_cache(self):
+        product_cache.clear()
+        url = reverse('product-batch')
+        unknown = str(uuid.uuid4())
+        payload = {'ids': [str(self.product3.pk), unknown, str(self.product1.pk)]}
+
+        with self.assertNumQueries(0):
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([row['id'] for row in data['results']], [str(self.product3.pk), str(self.product1.pk)])
+        self.assertEqual(data['results'][1]['price'], '999.99')
+        self.assertEqual(data['missing'], [unknown])
+
+        # saving invalidates the cached row once committed
+        self.product1.title = 'Gaming Laptop'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product1.save()
+        data = self.client.post(url, {'ids': [str(self.product1.pk)]}, format='json').json()
+        self.assertEqual(data['results'][0]['title'], 'Gaming Laptop')
+
+    def test_related_products_read_precomputed_rows(self):
+        RelatedProduct.objects.create(product=self.product1, related=self.product3, rank=0, score=2.0)
+        RelatedProduct.objects.create(product=self.product1, related=self.product2, rank=1, score=1.0)
+        url = reverse('product-related', args=[self.product1.pk])
+        with self.assertNumQueries(2):  # catalog version + related rows
+            response = self.client.get(url)
+        self.assertEqual([row['id'] for row in response.json()], [str(self.product3.pk), str(self.product2.pk)])
+
+    def test_compute_related_stores_neighbours(self):
+        similar = Product.objects.create(title='Gaming laptop lite', description='Budget gaming laptop', price=599.99)
+        ProductDocument._index.refresh()
+
+        call_command('compute_related', '--full', stdout=io.StringIO())
+
+        related = RelatedProduct.objects.filter(product=self.product1).order_by('rank')
+        self.assertEqual(related.first().related_id, similar.pk)
+        url = reverse('product-related', args=[self.product1.pk])
+        self.assertEqual(self.client.get(url).json()[0]['title'], 'Gaming laptop lite')
+
+    def test_warm_search_cache_replays_top_queries(self):
+        today = timezone.localdate()
+        SearchQueryDaily.objects.create(day=today, index='products', query='gaming laptop', count=2)
+        SearchQueryDaily.objects.create(day=today, index='products', query='phone', count=1)
+
+        out = io.StringIO()
+        call_command('warm_search_cache', stdout=out)
+        self.assertIn('products: replayed 2 queries', out.getvalue())
+
+    @override_settings(ELASTICSEARCH_PRODUCT_ROUTING=True)
+    def test_routing_follows_primary_category(self):
+        first = Category.objects.create(title='Computers')
+        second = Category.objects.create(title='Gaming')
+        ProductCategory.objects.create(product=self.product1, category=first)
+        ProductCategory.objects.create(product=self.product1, category=second)
+
+        def routings():
+            ProductDocument._index.refresh()
+            hits = ProductDocument.search().filter('ids', values=[str(self.product1.pk)]).execute()
+            return [hit.meta.routing for hit in hits]
+
+        self.assertEqual(routings(), [str(first.pk)])
+        ProductCategory.objects.filter(category=first).delete()
+        self.assertEqual(routings(), [str(second.pk)])
+
+        response = self.client.get(reverse('product-search'), {'q': 'laptop', 'category': str(second.pk)})
+        self.assertEqual([row['id'] for row in response.data['results']], [str(self.product1.pk)])
+        response = self.client.get(reverse('product-search'), {'q': 'laptop', 'category': str(first.pk)})
+        self.assertEqual(response.data['results'], [])
+
+    @override_settings(ELASTICSEARCH_PRODUCT_ROUTING=True)
+    def test_reconcile_keeps_only_the_current_routing(self):
+        current = Category.objects.create(title='Computers')
+        stale = Category.objects.create(title='Gaming')
+        ProductCategory.objects.create(product=self.product1, category=current)
+        # a leftover copy at a category the product isn't linked to anymore
+        ProductDocument._get_connection().index(
+            index=ProductDocument._index._name, id=str(self.product1.pk), routing=str(stale.pk),
+            document={'title': 'Laptop'}, refresh=True,
+        )
+
+        call_command('es_reconcile', 'products', '--no-parallel', stdout=io.StringIO())
+
+        ProductDocument._index.refresh()
+        hits = ProductDocument.search().filter('ids', values=[str(self.product1.pk)]).execute()
+        self.assertEqual([hit.meta.routing for hit in hits], [str(current.pk)])
+
+    def test_bulk_attach_and_detach_categories(self):
+        self.login_staff()
+        category = Category.objects.create(title='Computers')
+        payload = {'product_ids': [str(self.product1.pk), str(self.product2.pk)], 'category_ids': [str(category.pk)]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('product-category-links'), payload, format='json')
+        self.assertEqual(response.json(), {'attached': 2, 'existing': 0})
+        ProductDocument._index.refresh()
+        self.assertEqual(list(ProductDocument.get(id=str(self.product1.pk)).category_ids), [str(category.pk)])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product-category-links'), {'category': str(category.pk)})
+        self.assertEqual({row['product_title'] for row in response.json()['results']}, {'Laptop', 'Phone'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('product-category-detach'), payload, format='json')
+        self.assertEqual(response.json(), {'detached': 2})
+        ProductDocument._index.refresh()
+        self.assertEqual(list(ProductDocument.get(id=str(self.product1.pk)).category_ids), [])
+
+    @override_settings(ELASTICSEARCH_PRODUCT_ROUTING=True)
+    def test_bulk_detach_of_primary_category_moves_routed_copy(self):
+        self.login_staff()
+        first = Category.objects.create(title='Computers')
+        second = Category.objects.create(title='Gaming')
+        for category in (first, second):
+            payload = {'product_ids': [str(self.product1.pk)], 'category_ids': [str(category.pk)]}
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('product-category-links'), payload, format='json')
+
+        payload = {'product_ids': [str(self.product1.pk)], 'category_ids': [str(first.pk)]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('product-category-detach'), payload, format='json')
+        self.assertEqual(response.json(), {'detached': 1})
+
+        ProductDocument._index.refresh()
+        hits = ProductDocument.search().filter('ids', values=[str(self.product1.pk)]).execute()
+        self.assertEqual([hit.meta.routing for hit in hits], [str(second.pk)])
+
+    def test_search_export_streams_every_match(self):
+        for n in range(25):
+            Product.objects.create(title=f'Laptop {n}', price=1)
+        ProductDocument._index.refresh()
+
+        response = search_export(catalog_search(ProductDocument, 'laptop'), 'laptop', 'products', batch_size=10)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(len({row['id'] for row in rows}), 26)
+
+        response = self.client.get(reverse('product-search'), {'q': 'laptop', 'export': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertNotIn('ETag', response)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 26)
+        response = self.client.get(reverse('product-search'), {'export': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_product_create(self):
         url = reverse('product-list-create')
         data = {'title': 'New Product', 'description': 'Test desc', 'price': 100.00}
@@ -76,6 +310,42 @@ class ProductTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Product.objects.count(), 4)
 
+    def test_product_list_conditional_get(self):
+        url = reverse('product-list-create')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('products', response['Surrogate-Key'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # any write bumps the catalog version and invalidates the ETag
+        Product.objects.create(title='Monitor', description='4k display', price=199.99)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 4)
+
+class StartupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ProductDocument._index.delete(ignore_unavailable=True)
+        ProductDocument._index.create(ignore=[400])
+
+    @classmethod
+    def tearDownClass(cls):
+        ProductDocument._index.delete(ignore_unavailable=True)
+        super().tearDownClass()
+
+    def test_startup_detects_index_drift(self):
+        # indexed by autosync, auto_refresh makes it visible right away
+        Product.objects.create(title='Laptop', description='High-end gaming laptop', price=999.99)
+        self.assertTrue(StartupCommand.in_sync(ProductDocument))
+        ProductDocument.search().query("match_all").delete()
+        ProductDocument._index.refresh()
+        self.assertFalse(StartupCommand.in_sync(ProductDocument))
+
+
 class CategoryTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -152,4 +422,136 @@ class CategoryTests(TestCase):
     def test_product_category_bridge(self):
         self.assertEqual(ProductCategory.objects.count(), 1)
         product = Product.objects.get(title='Test Product')
-        self.assertEqual(product.categories.first().category.title, 'Electronics')
\ No newline at end of file
+        self.assertEqual(product.categories.first().category.title, 'Electronics')
+
+class RendererTests(SimpleTestCase):
+    def test_orjson_renderer_handles_uuid_and_decimal(self):
+        pk = uuid.uuid4()
+        rendered = ORJSONRenderer().render({'id': pk, 'price': Decimal('9.90')})
+        self.assertEqual(rendered, ('{"id":"%s","price":"9.90"}' % pk).encode())
+
+    def test_ndjson_renderer_unwraps_paginated_results(self):
+        rendered = NDJSONRenderer().render({'count': 2, 'results': [{'a': 1}, {'a': 2}]})
+        self.assertEqual(rendered, b'{"a":1}\n{"a":2}\n')
+
+    def test_orjson_parser_round_trip(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(b'{"title": "Laptop"}')), {'title': 'Laptop'})
+
+
+class CatalogCacheTests(TestCase):
+    def test_errors_get_no_cache_headers(self):
+        for url, params in (
+            (reverse('product-search'), {'q': 'laptop', 'category': 'nope'}),
+            (reverse('product-list-create'), {'limit': 'many'}),
+        ):
+            response = APIClient().get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertNotIn('ETag', response)
+            self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    def test_pages_get_cache_headers(self):
+        Category.objects.create(title='Books')
+        response = APIClient().get(reverse('category-list-create'))
+        self.assertIn('ETag', response)
+        self.assertIn('s-maxage', response['Cache-Control'])
+
+
+class SearchQueryRecorderTests(TestCase):
+    def test_search_queries_roll_up(self):
+        recorder = SearchQueryRecorder(sample_rate=1, flush_size=100, flush_interval=60)
+        request = RequestFactory().get('/')
+        for query in ('Gaming  Laptop', 'gaming laptop', 'phone'):
+            recorder.record(request, 'products', query)
+        recorder.flush()
+        recorder.record(request, 'products', 'Phone')
+        recorder.record(RequestFactory().get('/', HTTP_X_SEARCH_WARMUP='1'), 'products', 'phone')
+        recorder.flush()
+        self.assertEqual(dict(SearchQueryDaily.objects.values_list('query', 'count')), {'gaming laptop': 2, 'phone': 2})
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class RelatedProductTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(title='Laptop', price=999.99)
+
+    def test_products_without_neighbours_skip_the_live_search(self):
+        RelatedProduct.objects.create(product=self.product, related=None, rank=0, score=0)
+        with self.assertNumQueries(2):  # catalog version + related rows, no ES
+            response = APIClient().get(reverse('product-related', args=[self.product.pk]))
+        self.assertEqual(response.json(), [])
+
+    def test_unknown_product_is_not_found(self):
+        response = APIClient().get(reverse('product-related', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', response)
+
+    def test_link_writes_touch_the_product(self):
+        category = Category.objects.create(title='Computers')
+        touched = Product.objects.filter(pk=self.product.pk).values_list('updated_at', flat=True)
+        before = touched.get()
+        link = ProductCategory.objects.create(product=self.product, category=category)
+        self.assertGreater(touched.get(), before)
+        before = touched.get()
+        link.delete()
+        self.assertGreater(touched.get(), before)
+
+    def test_link_delete_reindexes_the_touched_product(self):
+        category = Category.objects.create(title='Computers')
+        link = ProductCategory.objects.create(product=self.product, category=category)
+        with override_settings(ELASTICSEARCH_DSL_AUTOSYNC=True), \
+                mock.patch.object(ProductDocument, 'update'), \
+                mock.patch.object(ProductDocument, 'reindex') as reindex, \
+                self.captureOnCommitCallbacks(execute=True):
+            link.delete()
+        reindex.assert_called_once_with([self.product.pk], {self.product.pk: [str(category.pk)]})
+
+
+class ProductDocumentTests(SimpleTestCase):
+    def test_timestamp_only_save_still_sends_updated_at(self):
+        self.assertEqual(set(indexed_changes(ProductDocument, {'updated_at'})), {'id', 'updated_at'})
+        self.assertEqual(indexed_changes(ProductDocument, {'created_at'}), [])
+        self.assertEqual(set(indexed_changes(ProductDocument, {'price', 'updated_at'})), {'id', 'price', 'updated_at'})
+
+    def test_price_source_keeps_two_decimals(self):
+        document = ProductDocument()
+        for price, expected in ((Decimal('5'), '5.00'), (899.0, '899.00'), (999.99, '999.99')):
+            self.assertEqual(document.prepare_price(Product(price=price)), expected)
+
+
+class IndexProfileTests(SimpleTestCase):
+    def test_rebuild_rejects_profile_with_other_mappings(self):
+        # mappings were built from ES_INDEX_PROFILE (serving), the indices must not mix them
+        with self.assertRaisesMessage(CommandError, 'ES_INDEX_PROFILE=small_footprint'):
+            call_command('es_boot_strap', '--profile', 'small_footprint', '--rebuild', stdout=io.StringIO())
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def test_reads_use_replicas_only_when_enabled(self):
+        self.assertEqual(router.db_for_read(Product), 'default')
+        with use_replicas():
+            self.assertEqual(router.db_for_read(Product), 'replica_1')
+            self.assertEqual(router.db_for_read(get_user_model()), 'default')
+            self.assertEqual(router.db_for_write(Product), 'default')
+
+    def serve(self, request, view):
+        """Run `view` through the middleware, returning the response and the db a read would use."""
+        middleware = ReplicaReadsMiddleware(lambda request: HttpResponse())
+        middleware.process_view(request, view, (), {})
+        db = router.db_for_read(Product)
+        response = HttpResponse(status=201 if request.method == 'POST' else 200)
+        return middleware.process_response(request, response), db
+
+    def test_middleware_routes_marked_safe_views_and_sticks_after_writes(self):
+        factory, view = RequestFactory(), ProductListCreateView.as_view()
+        response, db = self.serve(factory.get('/'), view)
+        self.assertEqual(db, 'replica_1')
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+        response, db = self.serve(factory.post('/'), view)
+        self.assertEqual(db, 'default')
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+        request = factory.get('/')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = '1'
+        self.assertEqual(self.serve(request, view)[1], 'default')
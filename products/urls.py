@@ -1,9 +1,17 @@
 from django.urls import path
-from .views import ProductSearchView, CategorySearchView, ProductListCreateView, CategoryListCreateView
+from .views import (
+    ProductSearchView, CategorySearchView, ProductListCreateView, CategoryListCreateView, ProductPriceBulkUpdateView,
+    ProductBatchView, ProductRelatedView, ProductCategoryLinkView, ProductCategoryDetachView,
+)
 
 urlpatterns = [
     path('products/search/', ProductSearchView.as_view(), name='product-search'),
     path('categories/search/', CategorySearchView.as_view(), name='category-search'),
     path('products/', ProductListCreateView.as_view(), name='product-list-create'),
+    path('products/<uuid:pk>/related/', ProductRelatedView.as_view(), name='product-related'),
+    path('products/batch/', ProductBatchView.as_view(), name='product-batch'),
+    path('products/prices/', ProductPriceBulkUpdateView.as_view(), name='product-price-bulk-update'),
     path('categories/', CategoryListCreateView.as_view(), name='category-list-create'),
+    path('product-categories/', ProductCategoryLinkView.as_view(), name='product-category-links'),
+    path('product-categories/detach/', ProductCategoryDetachView.as_view(), name='product-category-detach'),
 ]
\ No newline at end of file
@@ -1,12 +1,29 @@
+import uuid
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from elasticsearch import ConnectionError as ESConnectionError
+from elasticsearch_dsl.connections import get_connection
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
-from elasticsearch_dsl import Q
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
-from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
-from .documents import ProductDocument, CategoryDocument
+from .analytics import search_recorder
+from .cache import product_cache
+from .caching import catalog_cache
+from conf.renderers import NDJSONRenderer
+from conf.search import defer_signal_updates, partial_update
+from users.permissions import IsStaffOrSuperuser
+from .models import CatalogVersion, Product, Category, ProductCategory, RelatedProduct
+from .readers import category_list_reader, product_list_reader
+from .serializers import (
+    ProductSerializer, CategorySerializer, ProductPriceSerializer, ProductBatchSerializer, ProductCategoryBulkSerializer,
+    ProductCategoryLinkSerializer,
+)
+from .documents import ProductDocument, CategoryDocument, catalog_search
 
 
 class StandardPagination(PageNumberPagination):
@@ -17,29 +34,21 @@ class StandardPagination(PageNumberPagination):
 
 class ProductSearchView(APIView):
     pagination_class = StandardPagination
+    replica_reads = True
 
+    @catalog_cache('products')
     def get(self, request):
         query = (request.GET.get('q') or '').strip()
-        s = ProductDocument.search()
-
-        if not query:
-            # Return empty result set when no query provided
-            s = s[0:0]
-        else:
-            # Prefer exact-ish phrase match, and allow a stricter multi_match fallback without fuzziness
-            phrase_q = Q(
-                'multi_match',
-                query=query,
-                fields=['title', 'description'],
-                type='phrase'
-            )
-            strict_q = Q(
-                'multi_match',
-                query=query,
-                fields=['title', 'description'],
-                operator='and'  # no fuzziness; requires all terms
-            )
-            s = s.query('bool', should=[phrase_q, strict_q], minimum_should_match=1)
+        s = catalog_search(ProductDocument, query)
+        if request.GET.get('category'):
+            # products whose primary category it is, a single shard when routing by category
+            try:
+                s = ProductDocument.in_category(s, uuid.UUID(request.GET['category']))
+            except ValueError:
+                return Response({'detail': 'Invalid category.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.GET.get('export') == 'ndjson':
+            return search_export(s, query, 'products')
+        search_recorder.record(request, 'products', query)
 
         paginator = self.pagination_class()
         results = s.execute()
@@ -47,7 +56,7 @@ class ProductSearchView(APIView):
 
         results_data = [
             {
-                'id': hit.id,
+                'id': hit.meta.id,
                 'title': hit.title,
                 'description': hit.description,
             } for hit in paginated_results
@@ -58,29 +67,15 @@ class ProductSearchView(APIView):
 
 class CategorySearchView(APIView):
     pagination_class = StandardPagination
+    replica_reads = True
 
+    @catalog_cache('categories')
     def get(self, request):
         query = (request.GET.get('q') or '').strip()
-        s = CategoryDocument.search()
-
-        if not query:
-            # Return empty result set when no query provided
-            s = s[0:0]
-        else:
-            # Prefer exact-ish phrase match, and allow a stricter multi_match fallback without fuzziness
-            phrase_q = Q(
-                'multi_match',
-                query=query,
-                fields=['title', 'description'],
-                type='phrase'
-            )
-            strict_q = Q(
-                'multi_match',
-                query=query,
-                fields=['title', 'description'],
-                operator='and'  # no fuzziness; requires all terms
-            )
-            s = s.query('bool', should=[phrase_q, strict_q], minimum_should_match=1)
+        s = catalog_search(CategoryDocument, query)
+        if request.GET.get('export') == 'ndjson':
+            return search_export(s, query, 'categories')
+        search_recorder.record(request, 'categories', query)
 
         paginator = self.pagination_class()
         results = s.execute()
@@ -88,7 +83,7 @@ class CategorySearchView(APIView):
 
         results_data = [
             {
-                'id': hit.id,
+                'id': hit.meta.id,
                 'title': hit.title,
                 'description': hit.description,
             } for hit in paginated_results
@@ -97,15 +92,72 @@ class CategorySearchView(APIView):
         return paginator.get_paginated_response(results_data)
 
 
+def search_export(search, query, name, batch_size=1000, keep_alive='5m'):
+    """
+    Every hit of `search` as NDJSON ({"id", "title", "description"} per line), streamed in
+    point-in-time + search_after batches so memory stays flat whatever the match count.
+    The PIT is closed when the stream ends, fails or the client goes away.
+    """
+    if not query:
+        return Response({'detail': 'Export needs a query (q).'}, status=status.HTTP_400_BAD_REQUEST)
+
+    es = get_connection(search._using)
+    search = search._clone()
+    # routing narrows the PIT to the shards, a search over a PIT can't take it itself
+    routing = search._params.pop('routing', None)
+    index = search._index
+    search = search.index().source(['title', 'description']).sort('_shard_doc').extra(track_total_hits=False)
+
+    def rows():
+        pit_id = es.open_point_in_time(index=index, keep_alive=keep_alive, routing=routing)['id']
+        try:
+            page = search.extra(pit={'id': pit_id, 'keep_alive': keep_alive})[:batch_size]
+            while True:
+                response = page.execute().to_dict()
+                hits = response['hits']['hits']
+                if not hits:
+                    return
+                yield b''.join(
+                    NDJSONRenderer.dumps_line({'id': hit['_id'], **hit['_source']}) for hit in hits
+                )
+                # ES may hand back a new PIT id with each page
+                pit_id = response.get('pit_id', pit_id)
+                page = page.extra(pit={'id': pit_id, 'keep_alive': keep_alive}, search_after=hits[-1]['sort'])
+        finally:
+            # also runs on GeneratorExit, when the server closes the response of a dropped client
+            es.close_point_in_time(id=pit_id)
+
+    response = StreamingHttpResponse(rows(), content_type=NDJSONRenderer.media_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}.ndjson"'
+    return response
+
+
 """
 I am leaving the following endpoints simple as i don't know exact requirements and don't have much time
 I would implement custom permissions on create, update and delete endpoints if i knew more requirements and have more time
 """
 class ProductListCreateView(APIView):
+    max_limit = 1000
+    replica_reads = True
+
+    @catalog_cache('products')
     def get(self, request):
         products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+
+        # optional keyset paging: ?limit=100 then ?after=<last id>&limit=100, new ids are
+        # time-ordered (UUIDv7) so the pk alone gives a stable, index-only order
+        if 'after' in request.GET or 'limit' in request.GET:
+            try:
+                limit = min(int(request.GET.get('limit', 100)), self.max_limit)
+                after = uuid.UUID(request.GET['after']) if request.GET.get('after') else None
+            except ValueError:
+                return Response({'detail': 'Invalid after/limit.'}, status=status.HTTP_400_BAD_REQUEST)
+            if after is not None:
+                products = products.filter(id__gt=after)
+            products = products.order_by('id')[:max(limit, 0)]
+
+        # read-only listing, serializers are only used to validate writes
+        return Response(product_list_reader(products))
 
     def post(self, request):
         serializer = ProductSerializer(data=request.data)
@@ -116,14 +168,236 @@ class ProductListCreateView(APIView):
 
 
 class CategoryListCreateView(APIView):
+    replica_reads = True
+
+    @catalog_cache('categories')
     def get(self, request):
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        return Response(category_list_reader(Category.objects.all()))
 
     def post(self, request):
         serializer = CategorySerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProductPriceBulkUpdateView(APIView):
+    """
+    Price sweep: POST [{"id": ..., "price": "9.99"}, ...]. One bulk_update in Postgres and
+    one bulk of partial updates in ES instead of a save (and full reindex) per product.
+    """
+    permission_classes = [IsAuthenticated, IsStaffOrSuperuser]
+    max_items = 1000
+
+    def post(self, request):
+        serializer = ProductPriceSerializer(data=request.data, many=True, max_length=self.max_items)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        prices = {item['id']: item['price'] for item in serializer.validated_data}
+        products = Product.objects.only('id', 'price', 'updated_at').in_bulk(list(prices))
+        now = timezone.now()
+        changed = []
+        for pk, product in products.items():
+            if product.price != prices[pk]:
+                product.price = prices[pk]
+                product.updated_at = now
+                changed.append(product)
+
+        with transaction.atomic():
+            Product.objects.bulk_update(changed, ['price', 'updated_at'], batch_size=500)
+            if changed:
+                # bulk_update sends no signals
+                CatalogVersion.bump('products')
+                transaction.on_commit(lambda: self.sync(changed))
+
+        return Response({
+            'updated': len(changed),
+            'unchanged': len(products) - len(changed),
+            'missing': [pk for pk in prices if pk not in products],
+        })
+
+    @staticmethod
+    def sync(products):
+        partial_update(ProductDocument, [(product, ['id', 'price', 'updated_at']) for product in products])
+        # only now, a batch read before the ES update would cache the old price again
+        product_cache.discard(*(str(product.pk) for product in products))
+
+
+
+class LinkCursorPagination(CursorPagination):
+    # uuid7 ids are time-ordered and unique, a stable cursor without an extra index
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class ProductCategoryLinkView(APIView):
+    """
+    Product-category links, staff only. GET lists them (filter with ?product= / ?category=),
+    POST {"product_ids": [...], "category_ids": [...]} attaches every category to every product.
+    """
+    permission_classes = [IsAuthenticated, IsStaffOrSuperuser]
+    pagination_class = LinkCursorPagination
+
+    def get(self, request):
+        links = ProductCategory.objects.select_related('product', 'category').only(
+            'id', 'created_at', 'product__id', 'product__title', 'category__id', 'category__title'
+        )
+        try:
+            if request.GET.get('product'):
+                links = links.filter(product_id=uuid.UUID(request.GET['product']))
+            if request.GET.get('category'):
+                links = links.filter(category_id=uuid.UUID(request.GET['category']))
+        except ValueError:
+            return Response({'detail': 'Invalid product/category.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(links, request, view=self)
+        return paginator.get_paginated_response(ProductCategoryLinkSerializer(page, many=True).data)
+
+    def post(self, request):
+        serializer = ProductCategoryBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        product_ids, category_ids, missing = existing_link_targets(serializer.validated_data)
+        if missing:
+            return Response({'missing': missing}, status=status.HTTP_400_BAD_REQUEST)
+
+        links = ProductCategory.objects.filter(product_id__in=product_ids, category_id__in=category_ids)
+        existing = set(links.values_list('product_id', 'category_id'))
+        now = timezone.now()
+        new = [
+            ProductCategory(product_id=product_id, category_id=category_id, created_at=now)
+            for product_id in product_ids for category_id in category_ids
+            if (product_id, category_id) not in existing
+        ]
+        with transaction.atomic():
+            # a concurrent attach of the same pair is not an error
+            ProductCategory.objects.bulk_create(new, batch_size=1000, ignore_conflicts=True)
+            # ids are generated here, those found are the rows this request inserted and not
+            # ones a concurrent attach got in first
+            inserted = list(
+                ProductCategory.objects.filter(pk__in=[link.pk for link in new]).values_list('product_id', flat=True)
+            ) if new else []
+            if inserted:
+                reindex_products_on_commit(set(inserted))
+
+        return Response(
+            {'attached': len(inserted), 'existing': len(product_ids) * len(category_ids) - len(inserted)},
+            status=status.HTTP_201_CREATED if inserted else status.HTTP_200_OK,
+        )
+
+
+class ProductCategoryDetachView(APIView):
+    """POST {"product_ids": [...], "category_ids": [...]}: remove those links in one delete, staff only."""
+    permission_classes = [IsAuthenticated, IsStaffOrSuperuser]
+
+    def post(self, request):
+        serializer = ProductCategoryBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        links = ProductCategory.objects.filter(
+            product_id__in=serializer.validated_data['product_ids'],
+            category_id__in=serializer.validated_data['category_ids'],
+        )
+        with transaction.atomic(), defer_signal_updates():
+            # the deferred pre_delete signals would have kept these, a product may still
+            # be indexed at the routing of a category it loses here
+            detached_from = {}
+            for product_id, category_id in links.values_list('product_id', 'category_id'):
+                detached_from.setdefault(product_id, []).append(str(category_id))
+            detached, _ = links.delete()
+            if detached:
+                reindex_products_on_commit(list(detached_from), detached_from)
+
+        return Response({'detached': detached})
+
+
+def existing_link_targets(data):
+    """(product ids, category ids, ids of either that don't exist) for a bulk link request."""
+    product_ids = list(dict.fromkeys(data['product_ids']))
+    category_ids = list(dict.fromkeys(data['category_ids']))
+    found_products = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    found_categories = set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+    missing = [str(pk) for pk in product_ids if pk not in found_products]
+    missing += [str(pk) for pk in category_ids if pk not in found_categories]
+    return product_ids, category_ids, missing
+
+
+def reindex_products_on_commit(product_ids, indexed_category_ids=None):
+    """
+    Bump the products catalog once, touch the products' updated_at (incremental syncs and
+    compute_related go by it) and reindex `product_ids` in one bulk after commit, see
+    ProductDocument.reindex.
+    """
+    CatalogVersion.bump('products')
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+    transaction.on_commit(lambda: ProductDocument.reindex(product_ids, indexed_category_ids))
+
+
+class ProductBatchView(APIView):
+    """
+    Products by id for cart/wishlist pages: POST {"ids": [...]}. Rows come from the
+    in-process cache, then one ES mget, then one DB query for whatever ES didn't have.
+    """
+
+    def post(self, request):
+        serializer = ProductBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = list(dict.fromkeys(str(pk) for pk in serializer.validated_data['ids']))
+        rows = product_cache.get_many(ids)
+        misses = [pk for pk in ids if pk not in rows]
+        if misses:
+            fetched = self.fetch_from_es(misses)
+            fallback = [pk for pk in misses if pk not in fetched]
+            if fallback:
+                for row in product_list_reader(Product.objects.filter(pk__in=fallback)):
+                    fetched[str(row['id'])] = row
+            product_cache.set_many(fetched)
+            rows.update(fetched)
+
+        return Response({
+            'results': [rows[pk] for pk in ids if pk in rows],
+            'missing': [pk for pk in ids if pk not in rows],
+        })
+
+    def fetch_from_es(self, ids):
+        try:
+            sources = ProductDocument.sources(ids, product_list_reader.fields[1:])
+        except ESConnectionError:
+            return {}
+        return {pk: product_list_reader.map_source(pk, source) for pk, source in sources.items()}
+
+
+
+class ProductRelatedView(APIView):
+    """
+    Similar products for a product page, read from the RelatedProduct table in one indexed
+    query. Products not precomputed yet fall back to a live more-like-this search.
+    """
+    replica_reads = True
+    size = 10
+
+    @catalog_cache('products')
+    def get(self, request, pk):
+        rows = product_list_reader(RelatedProduct.objects.filter(product_id=pk).order_by('rank'), prefix='related__')
+        computed = bool(rows)
+        # the "no neighbours" marker joins to an all-null row
+        rows = [row for row in rows if row['id'] is not None]
+        if not computed:
+            if not Product.objects.filter(pk=pk).exists():
+                return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+            category_ids = (
+                ProductCategory.objects.filter(product_id=pk).order_by('created_at', 'pk').values_list('category_id', flat=True)
+            )
+            hits = ProductDocument.more_like_this(pk, list(category_ids), size=self.size).execute()
+            ids = [hit.meta.id for hit in hits]
+            by_id = {str(row['id']): row for row in product_list_reader(Product.objects.filter(pk__in=ids))}
+            rows = [by_id[pk] for pk in ids if pk in by_id]
+        return Response(rows)
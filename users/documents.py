@@ -1,25 +1,51 @@
 # users/documents.py
 from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch_dsl import analyzer, normalizer, token_filter, tokenizer
+from conf.search import id_field, match_only_text_field, source_meta
 from .models import User
 
+# split emails on anything that isn't a letter or digit: "john.doe@mail.com" -> john, doe, mail, com
+email_parts_tokenizer = tokenizer('email_parts', 'pattern', pattern='[^\\p{L}\\p{N}]+')
+
+# index side: every part is expanded into its prefixes so typing "joh" hits without fuzzy expansion
+email_ngram_analyzer = analyzer(
+    'email_ngram',
+    tokenizer=email_parts_tokenizer,
+    filter=['lowercase', token_filter('email_edge_ngram', 'edge_ngram', min_gram=2, max_gram=20)],
+)
+# search side: same split, no ngrams, otherwise every query prefix would match
+email_parts_analyzer = analyzer('email_parts', tokenizer=email_parts_tokenizer, filter=['lowercase'])
+
+lowercase_normalizer = normalizer('lowercase_normalizer', filter=['lowercase'])
+
+
 @registry.register_document
 class UserDocument(Document):
-    id = fields.KeywordField()
-    email = fields.TextField(analyzer='standard')
+    id = id_field()
+    email = fields.TextField(
+        analyzer='standard',
+        fields={
+            'raw': fields.KeywordField(normalizer=lowercase_normalizer),
+            'ngram': match_only_text_field(analyzer=email_ngram_analyzer, search_analyzer=email_parts_analyzer),
+        },
+    )
     first_name = fields.TextField(analyzer='standard')
     last_name = fields.TextField(analyzer='standard')
+    updated_at = fields.DateField()
 
     class Index:
         name = 'users'
         settings = {
             'number_of_shards': 1,
-            'number_of_replicas': 0,
         }
 
     class Django:
         model = User
         fields = []
 
+    class Meta:
+        source = source_meta()
+
     def prepare_id(self, instance):
-        return str(instance.id)
\ No newline at end of file
+        return str(instance.id)
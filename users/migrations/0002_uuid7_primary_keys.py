@@ -0,0 +1,19 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:56
+
+import conf.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=conf.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -112,3 +112,68 @@ class AuthTests(TestCase):
         self.assertTrue(data["is_staff"])
         self.assertIn("first_name", data)
         self.assertIn("last_name", data)
+
+
+class UserSearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Force delete and recreate the index so the email subfields are mapped
+        UserDocument._index.delete(ignore_unavailable=True)
+        UserDocument._index.create(ignore=[400])
+
+    @classmethod
+    def tearDownClass(cls):
+        UserDocument._index.delete(ignore_unavailable=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        UserDocument.search().query("match_all").delete()
+        UserDocument._index.refresh()
+
+        self.staff = User.objects.create_user(email="staff@example.com", password="StrongPass123!", is_staff=True)
+        self.alice = User.objects.create_user(
+            email="alice.walker@example.com", password="StrongPass123!", first_name="Alice", last_name="Walker"
+        )
+        self.bob = User.objects.create_user(
+            email="bob.stone@another.org", password="StrongPass123!", first_name="Robert", last_name="Stone"
+        )
+
+        for user in User.objects.all():
+            UserDocument().update(user)
+        UserDocument._index.refresh()
+
+        self.client.force_authenticate(self.staff)
+
+    def search(self, **params):
+        res = self.client.get("/users/search/", params)
+        self.assertEqual(res.status_code, 200, msg=res.data)
+        return res.json()
+
+    def test_full_email_is_exact_match(self):
+        data = self.search(q="Alice.Walker@example.com")
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(data["results"][0]["id"], str(self.alice.id))
+
+    def test_uuid_is_exact_match(self):
+        data = self.search(q=str(self.bob.id))
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(data["results"][0]["email"], self.bob.email)
+
+    def test_email_prefix_matches_ngram_subfield(self):
+        data = self.search(q="anoth")
+        self.assertEqual([u["email"] for u in data["results"]], [self.bob.email])
+
+    def test_name_typo_is_fuzzy_matched(self):
+        data = self.search(q="Walkr")
+        self.assertEqual([u["email"] for u in data["results"]], [self.alice.email])
+        self.assertEqual(data["total_relation"], "eq")
+
+    def test_page_beyond_result_window_is_rejected(self):
+        res = self.client.get("/users/search/", {"q": "alice", "page": 1001})
+        self.assertEqual(res.status_code, 400)
+
+    def test_invalid_page_is_rejected(self):
+        res = self.client.get("/users/search/", {"q": "alice", "page": "abc"})
+        self.assertEqual(res.status_code, 400)
@@ -1,4 +1,9 @@
+import uuid
+
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from elasticsearch_dsl import Q
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -58,30 +63,38 @@ class MeView(APIView):
 
 class UserSearchView(APIView):
     permission_classes = [IsAuthenticated, IsStaffOrSuperuser]
+    page_size = 10  # Fixed page size
+    # ES stops counting (and paging) past index.max_result_window, 10k by default
+    max_result_window = 10000
+
     def get(self, request):
-        query = request.GET.get('q', '')
-        page = int(request.GET.get('page', 1))
-        page_size = 10  # Fixed page size
+        query = (request.GET.get('q') or '').strip()
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            return Response({'detail': 'Page must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
         if not query:
             return Response({'results': [], 'total': 0}, status=status.HTTP_200_OK)
 
-        s = UserDocument.search().query(
-            'multi_match',
-            query=query,
-            fields=['email', 'first_name', 'last_name'],
-            fuzziness='AUTO'
-        )
-
         # Pagination
-        start = (page - 1) * page_size
-        end = start + page_size
+        start = (page - 1) * self.page_size
+        end = start + self.page_size
+        if end > self.max_result_window:
+            return Response(
+                {'detail': f'Only the first {self.max_result_window} matches can be paged through, refine the query.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        s = UserDocument.search().query(self.build_query(query)).extra(track_total_hits=self.max_result_window)
         results = s[start:end].execute()
-        total = results.hits.total.value
+        total = results.hits.total
 
         users = [
             {
-                'id': hit.id,
+                'id': hit.meta.id,
                 'email': hit.email,
                 'first_name': hit.first_name,
                 'last_name': hit.last_name,
@@ -89,4 +102,41 @@ class UserSearchView(APIView):
             for hit in results
         ]
 
-        return Response({'results': users, 'total': total, 'page': page, 'page_size': page_size}, status=status.HTTP_200_OK)
+        return Response(
+            {
+                'results': users,
+                'total': total.value,
+                # "gte" means ES stopped counting at max_result_window, the real number is larger
+                'total_relation': total.relation,
+                'page': page,
+                'page_size': self.page_size,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @staticmethod
+    def build_query(query):
+        # a pasted id or full email is an exact lookup, no need to score anything
+        try:
+            return Q('ids', values=[str(uuid.UUID(query))])
+        except ValueError:
+            pass
+        try:
+            validate_email(query)
+        except ValidationError:
+            pass
+        else:
+            return Q('term', **{'email.raw': query.lower()})
+
+        # partial input: prefixes of email parts come from the ngram subfield, typos are
+        # only tolerated on names and the first character must match to keep expansion small
+        name_q = Q(
+            'multi_match',
+            query=query,
+            fields=['first_name', 'last_name'],
+            fuzziness='AUTO',
+            prefix_length=1,
+            max_expansions=20,
+        )
+        email_q = Q('match', **{'email.ngram': {'query': query, 'operator': 'and'}})
+        return Q('bool', should=[name_q, email_q], minimum_should_match=1)